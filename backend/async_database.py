@@ -0,0 +1,48 @@
+"""
+Async engine and session for the `async def` routers (classes, auth).
+
+Points at the same database as database.py, through an async driver
+(aiosqlite for SQLite, asyncpg for PostgreSQL), so queries never block the
+event loop. Sessions don't expire on commit: lazy loads are not possible in
+async code, so relationships must be loaded explicitly (selectinload/refresh).
+"""
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from . import slow_queries
+from .database import SQLALCHEMY_DATABASE_URL, apply_sqlite_pragmas, is_sqlite, pool_options
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def to_async_url(url: str) -> str:
+    """'sqlite:///./school_app.db' -> 'sqlite+aiosqlite:///./school_app.db'"""
+    scheme, _, rest = url.partition("://")
+    backend = scheme.split("+")[0]
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}'")
+    return f"{ASYNC_DRIVERS[backend]}://{rest}"
+
+
+def create_async_engine_from_env(url: str = None, **overrides):
+    """Async counterpart of database.create_engine_from_env (same pooling and pragmas)."""
+    url = url or SQLALCHEMY_DATABASE_URL
+    options = pool_options(url)
+    options.update(overrides)
+    engine = create_async_engine(to_async_url(url), **options)
+    if is_sqlite(url):
+        event.listen(engine.sync_engine, "connect", apply_sqlite_pragmas)
+    slow_queries.install(engine.sync_engine)
+    return engine
+
+
+async_engine = create_async_engine_from_env()
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_db():
+    """Request-scoped AsyncSession, shared by get_current_user_async and the endpoint."""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,99 @@
+"""
+Set-based loading of subject templates.
+
+Templates are identified by (name, education_level, grade): loading the same
+curriculum twice updates the hours instead of creating duplicates. Everything
+runs inside the caller's transaction; the caller commits.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import uuid4
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+from . import models, schemas
+from .template_cache import bump_version
+
+# Subjects in the official JSON that are not taught by a teacher
+SKIPPED_SUBJECTS = {"Recreo"}
+
+LEVEL_ALIASES = {
+    "infantil": models.EducationLevel.INFANTIL,
+    "primaria": models.EducationLevel.PRIMARIA,
+    "secundaria": models.EducationLevel.SECUNDARIA,
+    "eso": models.EducationLevel.SECUNDARIA,
+}
+
+TemplateKey = Tuple[str, models.EducationLevel, Optional[int]]
+
+
+def parse_level_key(level_key: str) -> Tuple[int, models.EducationLevel]:
+    """'1_Primaria' -> (1, EducationLevel.PRIMARIA)"""
+    grade, _, level_name = level_key.partition("_")
+    level = LEVEL_ALIASES.get(level_name.strip().lower())
+    if not grade.isdigit() or level is None:
+        raise ValueError(f"Unrecognised curriculum key '{level_key}'")
+    return int(grade), level
+
+
+def templates_from_curriculum(data: schemas.OfficialCurriculum) -> List[schemas.SubjectTemplateCreate]:
+    templates = []
+    for level_key, subjects in data.asignaturas_y_horas.items():
+        grade, level = parse_level_key(level_key)
+        for subj in subjects:
+            if subj.nombre in SKIPPED_SUBJECTS:
+                continue
+            templates.append(schemas.SubjectTemplateCreate(
+                name=subj.nombre,
+                default_hours=subj.horas,
+                education_level=level,
+                grade=grade
+            ))
+    return templates
+
+
+def upsert_templates(db: Session, templates: Iterable[schemas.SubjectTemplateCreate]) -> Tuple[int, int, List[models.SubjectTemplate]]:
+    """Insert or update templates with one SELECT and one executemany per operation."""
+    # Last occurrence wins if the payload repeats a key
+    incoming: Dict[TemplateKey, schemas.SubjectTemplateCreate] = {}
+    for t in templates:
+        incoming[(t.name, t.education_level, t.grade)] = t
+    if not incoming:
+        return 0, 0, []
+
+    levels = {key[1] for key in incoming}
+    existing = {
+        (row.name, row.education_level, row.grade): row.id
+        for row in db.query(
+            models.SubjectTemplate.id,
+            models.SubjectTemplate.name,
+            models.SubjectTemplate.education_level,
+            models.SubjectTemplate.grade
+        ).filter(models.SubjectTemplate.education_level.in_(levels))
+    }
+
+    to_insert = []
+    to_update = []
+    for key, t in incoming.items():
+        if key in existing:
+            to_update.append({"id": existing[key], "default_hours": t.default_hours})
+        else:
+            to_insert.append({
+                "id": str(uuid4()),
+                "name": t.name,
+                "default_hours": t.default_hours,
+                "education_level": t.education_level,
+                "grade": t.grade
+            })
+
+    if to_insert:
+        db.execute(insert(models.SubjectTemplate), to_insert)
+    if to_update:
+        db.execute(update(models.SubjectTemplate), to_update)
+    bump_version(db)
+
+    ids = [row["id"] for row in to_insert] + [row["id"] for row in to_update]
+    rows = db.query(models.SubjectTemplate).filter(models.SubjectTemplate.id.in_(ids)).all()
+    return len(to_insert), len(to_update), rows
+
+
+def load_curriculum(db: Session, data: schemas.OfficialCurriculum) -> Tuple[int, int, List[models.SubjectTemplate]]:
+    return upsert_templates(db, templates_from_curriculum(data))
@@ -1,16 +1,80 @@
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
+from . import slow_queries
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./school_app.db"
+# sqlite:///./school_app.db (default) or e.g. postgresql://user:pass@db:5432/school
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./school_app.db")
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# Applied to every new SQLite connection. WAL lets readers run alongside the
+# single writer, which matters as soon as more than one worker is running.
+# It keeps -wal/-shm files next to the database: mount the whole directory
+# (not just the file) when running in a container, or use DELETE.
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_PRAGMAS = {
+    "journal_mode": SQLITE_JOURNAL_MODE,
+    # NORMAL is only crash-safe in WAL mode
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL" if SQLITE_JOURNAL_MODE.upper() == "WAL" else "FULL"),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", -64 * 1024)), # Negative = KiB, i.e. 64 MiB
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+    "temp_store": "MEMORY",
+}
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def pool_options(url: str) -> dict:
+    """Connection pool settings for server databases (SQLite keeps SQLAlchemy's defaults)."""
+    if is_sqlite(url):
+        return {}
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 10)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 20)),
+        "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+    }
+
+
+def create_engine_from_env(url: str = None, **overrides):
+    """Engine for `url` (default: DATABASE_URL) with pooling and SQLite pragmas configured."""
+    url = url or SQLALCHEMY_DATABASE_URL
+    options = pool_options(url)
+    if is_sqlite(url):
+        options["connect_args"] = {"check_same_thread": False}
+    options.update(overrides)
+    engine = create_engine(url, **options)
+    if is_sqlite(url):
+        event.listen(engine, "connect", apply_sqlite_pragmas)
+    slow_queries.install(engine) # No-op unless SLOW_QUERY_MS is set
+    return engine
+
+
+engine = create_engine_from_env()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
 def get_db():
+    """
+    The one request-scoped session. FastAPI caches a dependency per request, so
+    get_current_user and the endpoint receive the same session (one connection,
+    one identity map) as long as both depend on this function.
+    """
     db = SessionLocal()
     try:
         yield db
@@ -0,0 +1,221 @@
+"""
+Push events for grades, invoices, announcements and timetables.
+
+Every committed ORM write to those tables adds a small delta to its
+`change_log` row (invalidation.add_events), e.g.
+
+    {"type": "grade", "op": "upsert", "id": "g_1", "student_id": "u_5",
+     "subject": "Math", "score": 7.5, "date": "2026-10-19",
+     "audience": ["student:u_5"]}
+
+Timetable changes only say which class changed ({"type": "timetable",
+"class_id": ...}): clients refetch /schedule/view for it. The bus delivers
+the rows to every worker, and `hub` fans them out to the open streams of
+that worker (routers/events.py). A stream only receives events whose
+audience intersects the caller's scope keys (`scope_keys`). Principals
+receive everything; invoices only reach the parent they are billed to.
+
+Each stream has a bounded queue (EVENTS_QUEUE, default 256). A client that
+falls behind gets one "resync" event and should reload /api/bootstrap.
+"""
+import asyncio
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from . import invalidation, models
+
+QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE", 256))
+HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT_S", 15))
+
+EVERYONE = "school"
+RESYNC = {"type": "resync"}
+
+
+# --- Deltas from session writes ---
+
+def _grade(grade: models.Grade, op: str) -> Dict:
+    return {
+        "type": "grade", "op": op, "id": grade.id, "student_id": grade.student_id,
+        "subject": grade.subject, "score": grade.score, "date": grade.date,
+        "audience": [f"student:{grade.student_id}"],
+    }
+
+
+def _invoice(invoice: models.Invoice, op: str) -> Dict:
+    return {
+        "type": "invoice", "op": op, "id": invoice.id, "student_id": invoice.student_id,
+        "parent_id": invoice.parent_id, "amount": invoice.amount, "status": invoice.status,
+        "due_date": invoice.due_date,
+        # Family finances: the paying parent only, not the student's teachers (who hold student: keys)
+        "audience": [f"parent:{invoice.parent_id}"],
+    }
+
+
+def _announcement(announcement: models.Announcement, op: str) -> Dict:
+    target = announcement.target_class_id
+    return {
+        "type": "announcement", "op": op, "id": announcement.id, "title": announcement.title,
+        "date": announcement.date, "target_class_id": target,
+        "audience": [f"class:{target}" if target else EVERYONE],
+    }
+
+
+DELTAS = {
+    models.Grade: _grade,
+    models.Invoice: _invoice,
+    models.Announcement: _announcement,
+}
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_events(session, flush_context):
+    events: List[Dict] = []
+    timetables: Set[str] = set()
+    for objects, op in ((session.new, "upsert"), (session.dirty, "upsert"), (session.deleted, "delete")):
+        for obj in objects:
+            if isinstance(obj, models.ScheduleSlot):
+                if obj.class_id:
+                    timetables.add(obj.class_id)
+                continue
+            delta = DELTAS.get(type(obj))
+            if delta and (op != "upsert" or obj in session.new or session.is_modified(obj)):
+                events.append(delta(obj, op))
+    events.extend({"type": "timetable", "class_id": c, "audience": [f"class:{c}"]} for c in sorted(timetables))
+    if events:
+        invalidation.add_events(session, events)
+
+
+def add_deltas(session: Session, rows: Iterable, op: str = "upsert"):
+    """For writes made with bulk statements, which no flush sees. rows are model instances (may be transient)."""
+    deltas = [DELTAS[type(row)](row, op) for row in rows]
+    if deltas:
+        invalidation.add_events(session, deltas)
+
+
+# --- Scope ---
+
+async def class_ids_for(db: AsyncSession, user: models.User) -> Optional[Set[str]]:
+    """Classes the user follows, or None for all of them (principals)."""
+    role = user.role
+    if role == models.UserRole.PRINCIPAL:
+        return None
+    if role == models.UserRole.TEACHER:
+        # Classes they tutor or teach a subject in
+        classes = set(await db.scalars(select(models.ClassGroup.id).where(models.ClassGroup.teacher_id == user.id)))
+        classes.update(await db.scalars(
+            select(models.ClassSubject.class_id).where(models.ClassSubject.teacher_id == user.id).distinct()
+        ))
+        return classes
+    if role == models.UserRole.PARENT:
+        children_classes = await db.scalars(
+            select(models.User.class_id)
+            .join(models.parent_student_association, models.parent_student_association.c.student_id == models.User.id)
+            .where(models.parent_student_association.c.parent_id == user.id, models.User.class_id.is_not(None))
+            .distinct()
+        )
+        return set(children_classes)
+    return {user.class_id} if user.class_id else set()
+
+
+async def scope_keys(db: AsyncSession, user: models.User) -> Optional[Set[str]]:
+    """Audience keys the user may receive, or None for everything (principals)."""
+    role = user.role
+    if role == models.UserRole.PRINCIPAL:
+        return None
+    keys = {EVERYONE}
+    if role == models.UserRole.TEACHER:
+        # Their classes and those classes' students
+        classes = await class_ids_for(db, user)
+        students = await db.scalars(select(models.User.id).where(models.User.class_id.in_(classes))) if classes else []
+        keys.update(f"class:{c}" for c in classes)
+        keys.update(f"student:{s}" for s in students)
+    elif role == models.UserRole.PARENT:
+        children = (await db.execute(
+            select(models.User.id, models.User.class_id)
+            .join(models.parent_student_association, models.parent_student_association.c.student_id == models.User.id)
+            .where(models.parent_student_association.c.parent_id == user.id)
+        )).all()
+        keys.add(f"parent:{user.id}")
+        keys.update(f"student:{child_id}" for child_id, _ in children)
+        keys.update(f"class:{class_id}" for _, class_id in children if class_id)
+    elif role == models.UserRole.STUDENT:
+        keys.add(f"student:{user.id}")
+        if user.class_id:
+            keys.add(f"class:{user.class_id}")
+    return keys
+
+
+def visible(event: Dict, keys: Optional[Set[str]]) -> bool:
+    return keys is None or event.get("type") == "resync" or bool(keys.intersection(event.get("audience", ())))
+
+
+# --- Fan-out to open streams ---
+
+class Subscription:
+    def __init__(self, keys: Optional[Set[str]], loop: asyncio.AbstractEventLoop):
+        self.keys = keys
+        self.loop = loop
+        # (change id, event)
+        self.queue: "asyncio.Queue" = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.overflowed = False
+
+    def put(self, change_id: Optional[int], event: Dict):
+        """Runs on the event loop."""
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait((change_id, event))
+        except asyncio.QueueFull:
+            # Dropping events silently would leave the client wrong: tell it to reload instead
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait((None, RESYNC))
+
+
+class EventHub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions: Set[Subscription] = set()
+
+    def subscribe(self, keys: Optional[Set[str]]) -> Subscription:
+        subscription = Subscription(keys, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, change_id: Optional[int], events: List[Dict]):
+        """Called from any thread (the committing request or the poller)."""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            for event in events:
+                if visible(event, subscription.keys):
+                    try:
+                        subscription.loop.call_soon_threadsafe(subscription.put, change_id, event)
+                    except RuntimeError:
+                        # Loop closed (shutdown)
+                        break
+
+    def __len__(self):
+        return len(self._subscriptions)
+
+
+hub = EventHub()
+invalidation.subscribe_events(hub.publish)
+
+
+def _on_invalidation(tags):
+    # The whole database changed (seeding): no delta can describe it
+    if invalidation.ALL in tags:
+        hub.publish(None, [RESYNC])
+
+
+invalidation.subscribe(_on_invalidation)
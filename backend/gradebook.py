@@ -0,0 +1,254 @@
+"""
+Batch grade writes and per-class, per-subject running aggregates.
+
+`grade_aggregates` keeps count, sum and sum of squares of the scores of each
+(class, subject). The mean and standard deviation are derived from them
+without reading the grades. A grade counts towards its student's current
+class. `upsert_grades` applies its own deltas with atomic increments in the
+caller's transaction, so the totals commit together with the grades.
+
+Batches touching the same (class, subject) are serialized on its aggregate
+row: `upsert_grades` creates the missing rows and locks them (SELECT ... FOR
+UPDATE; on SQLite the insert already takes the database write lock) before
+it reads the grades it is about to change. A second batch therefore sees the
+first one's grades and computes its deltas from them. A unique index on
+(student, subject, date) backs this up.
+Operations that move grades between classes wholesale (roster changes,
+seeding) call `refresh_aggregates` instead, which recomputes the given
+classes from the grades table.
+"""
+import math
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+from uuid import uuid4
+from sqlalchemy import bindparam, delete, func, insert, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from . import events, models, schemas
+
+# Keep IN (...) lists well below SQLite's bound-parameter limit
+CHUNK_SIZE = 500
+
+Grade = models.Grade
+Aggregate = models.GradeAggregate
+_aggregates = Aggregate.__table__
+
+# (class_id, subject)
+AggregateKey = Tuple[str, str]
+
+
+class GradebookError(ValueError):
+    """A batch that can't be applied. status is the HTTP status the router answers with."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def summarize(class_id: str, subject: str, count: int, total: float, total_sq: float) -> Dict:
+    if not count:
+        return {"class_id": class_id, "subject": subject, "count": 0, "mean": None, "stddev": None}
+    mean = total / count
+    # Population standard deviation; clamped because float error can go slightly negative
+    variance = max(total_sq / count - mean * mean, 0.0)
+    return {"class_id": class_id, "subject": subject, "count": count,
+            "mean": round(mean, 4), "stddev": round(math.sqrt(variance), 4)}
+
+
+def gradable_subjects(db: Session, teacher_id: str) -> Dict[str, Set[str]]:
+    """
+    Class id -> subjects a teacher may grade there: the class subjects they
+    teach, plus, in the classes they tutor, those nobody is assigned to.
+    """
+    tutored = select(models.ClassGroup.id).where(models.ClassGroup.teacher_id == teacher_id)
+    allowed: Dict[str, Set[str]] = {}
+    for class_id, subject in db.execute(
+        select(models.ClassSubject.class_id, models.ClassSubject.name).where(or_(
+            models.ClassSubject.teacher_id == teacher_id,
+            models.ClassSubject.teacher_id.is_(None) & models.ClassSubject.class_id.in_(tutored),
+        ))
+    ):
+        allowed.setdefault(class_id, set()).add(subject)
+    return allowed
+
+
+def upsert_grades(db: Session, cells: Iterable[schemas.GradeCell],
+                  allowed_subjects: Optional[Dict[str, Set[str]]] = None) -> Dict:
+    """
+    Insert or update many grades, keyed on (student, subject, date), and
+    update the aggregates of every (class, subject) they touch. With
+    allowed_subjects (see `gradable_subjects`), a grade is rejected unless its
+    subject is allowed in the student's class. Caller commits.
+    """
+    # The sessions don't autoflush, and the expire_all below would drop the caller's pending changes
+    db.flush()
+    today = date.today()
+    # Last occurrence wins if the payload repeats a key
+    incoming: Dict[Tuple[str, str, date], schemas.GradeCell] = {}
+    for cell in cells:
+        incoming[(cell.student_id, cell.subject, cell.date or today)] = cell
+    if not incoming:
+        return {"created": 0, "updated": 0, "aggregates": []}
+
+    student_ids = sorted({key[0] for key in incoming})
+    subjects = {key[1] for key in incoming}
+    student_class: Dict[str, Optional[str]] = {}
+    for i in range(0, len(student_ids), CHUNK_SIZE):
+        chunk = student_ids[i:i + CHUNK_SIZE]
+        student_class.update(db.execute(
+            select(models.User.id, models.User.class_id)
+            .where(models.User.id.in_(chunk), models.User.role == models.UserRole.STUDENT)
+        ).all())
+
+    unknown = [sid for sid in student_ids if sid not in student_class]
+    if unknown:
+        raise GradebookError(f"Unknown students: {', '.join(unknown[:20])}", status=400)
+    if allowed_subjects is not None:
+        foreign = [sid for sid in student_ids if student_class[sid] not in allowed_subjects]
+        if foreign:
+            raise GradebookError(f"Students outside your classes: {', '.join(foreign[:20])}", status=403)
+        untaught = sorted({f"{subject} ({student_class[sid]})" for sid, subject, _ in incoming
+                           if subject not in allowed_subjects[student_class[sid]]})
+        if untaught:
+            raise GradebookError(f"Subjects you don't teach: {', '.join(untaught[:20])}", status=403)
+
+    # Lock before reading: the old scores the deltas start from must not change under us
+    _lock_aggregates(db, {(student_class[sid], subject) for sid, subject, _ in incoming if student_class[sid]})
+    existing: Dict[Tuple[str, str, date], Tuple[str, Optional[float]]] = {}
+    for i in range(0, len(student_ids), CHUNK_SIZE):
+        chunk = student_ids[i:i + CHUNK_SIZE]
+        # Served by ix_grades_student_subject
+        for grade_id, student_id, subject, day, score in db.execute(
+            select(Grade.id, Grade.student_id, Grade.subject, Grade.date, Grade.score)
+            .where(Grade.student_id.in_(chunk), Grade.subject.in_(subjects))
+        ):
+            existing[(student_id, subject, day)] = (grade_id, score)
+
+    to_insert: List[Dict] = []
+    to_update: List[Dict] = []
+    grade_ids: Dict[Tuple[str, str, date], str] = {}
+    # (class, subject) -> [count, sum, sum of squares] deltas
+    deltas: Dict[AggregateKey, List[float]] = {}
+    for (student_id, subject, day), cell in incoming.items():
+        old_score = None
+        if (student_id, subject, day) in existing:
+            grade_id, old_score = existing[(student_id, subject, day)]
+            row = {"id": grade_id, "score": cell.score}
+            if cell.feedback is not None:
+                row["feedback"] = cell.feedback
+            to_update.append(row)
+        else:
+            grade_id = f"grade_{uuid4().hex[:12]}"
+            to_insert.append({"id": grade_id, "student_id": student_id, "subject": subject,
+                              "score": cell.score, "feedback": cell.feedback or "", "date": day})
+        grade_ids[(student_id, subject, day)] = grade_id
+        class_id = student_class[student_id]
+        if class_id is None:
+            continue
+        delta = deltas.setdefault((class_id, subject), [0, 0.0, 0.0])
+        if old_score is None:
+            delta[0] += 1
+            delta[1] += cell.score
+            delta[2] += cell.score * cell.score
+        else:
+            delta[1] += cell.score - old_score
+            delta[2] += cell.score * cell.score - old_score * old_score
+
+    if to_insert:
+        try:
+            db.execute(insert(Grade), to_insert)
+        except IntegrityError:
+            # Only students without a class aren't covered by the aggregate locks
+            raise GradebookError("Another batch wrote some of these grades at the same time: retry", status=409)
+    if to_update:
+        db.execute(update(Grade), to_update)
+    if deltas:
+        _apply_deltas(db, deltas)
+
+    # Bulk statements bypass the flush that builds push events
+    events.add_deltas(db, [
+        Grade(id=grade_ids[key], student_id=key[0], subject=key[1], score=cell.score, date=key[2])
+        for key, cell in incoming.items()
+    ])
+    db.expire_all()
+    return {"created": len(to_insert), "updated": len(to_update), "aggregates": read_aggregates(db, deltas)}
+
+
+# Dialects with INSERT ... ON CONFLICT DO NOTHING
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def _lock_aggregates(db: Session, keys: Set[AggregateKey]):
+    """Create the missing aggregate rows of `keys` and lock them until the caller's transaction ends."""
+    if not keys:
+        return
+    rows = [{"class_id": c, "subject": s, "count": 0, "total": 0.0, "total_sq": 0.0} for c, s in sorted(keys)]
+    class_ids = sorted({class_id for class_id, _ in keys})
+    dialect_insert = _UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if dialect_insert is not None:
+        db.execute(dialect_insert(_aggregates).on_conflict_do_nothing(), rows)
+    else:
+        # No portable upsert: insert what's missing (two first batches can still collide on the key)
+        present = set(db.execute(
+            select(Aggregate.class_id, Aggregate.subject).where(Aggregate.class_id.in_(class_ids))
+        ).all())
+        missing = [row for row in rows if (row["class_id"], row["subject"]) not in present]
+        if missing:
+            db.execute(insert(_aggregates), missing)
+    # Always in the same order, so two batches can't deadlock on each other's rows
+    for i in range(0, len(class_ids), CHUNK_SIZE):
+        db.execute(
+            select(Aggregate.class_id).where(Aggregate.class_id.in_(class_ids[i:i + CHUNK_SIZE]))
+            .order_by(Aggregate.class_id, Aggregate.subject).with_for_update()
+        ).all()
+
+
+def _apply_deltas(db: Session, deltas: Dict[AggregateKey, List[float]]):
+    # The rows exist and are locked (see _lock_aggregates)
+    # Relative updates: concurrent batches on the same class add up instead of overwriting each other
+    db.execute(
+        update(_aggregates)
+        .where(_aggregates.c.class_id == bindparam("b_class_id"), _aggregates.c.subject == bindparam("b_subject"))
+        .values(
+            count=_aggregates.c.count + bindparam("d_count"),
+            total=_aggregates.c.total + bindparam("d_total"),
+            total_sq=_aggregates.c.total_sq + bindparam("d_total_sq"),
+        ),
+        [{"b_class_id": c, "b_subject": s, "d_count": d[0], "d_total": d[1], "d_total_sq": d[2]}
+         for (c, s), d in deltas.items()],
+    )
+
+
+def read_aggregates(db: Session, keys: Iterable[AggregateKey]) -> List[Dict]:
+    keys = set(keys)
+    if not keys:
+        return []
+    rows = db.execute(
+        select(Aggregate.class_id, Aggregate.subject, Aggregate.count, Aggregate.total, Aggregate.total_sq)
+        .where(Aggregate.class_id.in_({class_id for class_id, _ in keys}))
+        .order_by(Aggregate.class_id, Aggregate.subject)
+    ).all()
+    return [summarize(*row) for row in rows if (row[0], row[1]) in keys]
+
+
+def refresh_aggregates(db: Union[Session, Connection], class_ids: Optional[Iterable[str]] = None):
+    """Recompute the aggregates of some classes (default: all) from the grades table. Caller commits."""
+    scores = (
+        select(models.User.class_id, Grade.subject, func.count(Grade.score), func.sum(Grade.score),
+               func.sum(Grade.score * Grade.score))
+        .join(models.User, models.User.id == Grade.student_id)
+        .where(models.User.class_id.is_not(None))
+        .group_by(models.User.class_id, Grade.subject)
+    )
+    columns = ["class_id", "subject", "count", "total", "total_sq"]
+    if class_ids is None:
+        db.execute(delete(_aggregates))
+        db.execute(insert(_aggregates).from_select(columns, scores))
+        return
+    class_ids = sorted(set(class_ids))
+    for i in range(0, len(class_ids), CHUNK_SIZE):
+        chunk = class_ids[i:i + CHUNK_SIZE]
+        db.execute(delete(_aggregates).where(_aggregates.c.class_id.in_(chunk)))
+        db.execute(insert(_aggregates).from_select(columns, scores.where(models.User.class_id.in_(chunk))))
@@ -0,0 +1,277 @@
+"""
+Cross-worker cache invalidation through the `change_log` table.
+
+Every committed write publishes the tags it touched. A tag is a table name,
+plus "table:partition" for the tables in PARTITION_COLUMNS (e.g.
+"users:class_1"), or "table:*" when the partition is unknown. Session events
+collect them from flushed rows and from bulk insert/update/delete
+statements. Just before the commit, they are written as one `change_log` row
+in the same transaction, so a change and its invalidation commit together.
+After the commit, subscribers in this process are told right away. Every
+worker runs a `ChangeLogPoller` thread that reads new rows every
+INVALIDATION_POLL_MS (default 500) and passes other processes' tags to its
+own subscribers. No external service is involved: a cached response is stale
+for at most one poll interval after another worker's write.
+
+A change can also carry small event payloads (`add_events`), which travel
+the same way to `subscribe_events` callbacks. The push stream in events.py
+is built on them.
+
+Subscribers are callables taking a set of tags. ALL ("*") means everything
+changed: the database was replaced (seeding), or this worker fell behind the
+pruned log. Rows older than INVALIDATION_RETENTION_S (default 1h) are
+deleted. Writes that bypass the Session (raw connections) call `announce`.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set
+from uuid import uuid4
+from sqlalchemy import delete, event, func, insert, select
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from . import models
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = float(os.getenv("INVALIDATION_POLL_MS", 500)) / 1000
+RETENTION = timedelta(seconds=float(os.getenv("INVALIDATION_RETENTION_S", 3600)))
+PRUNE_EVERY = 60.0 # seconds
+
+# Identifies this process in change_log.origin
+ORIGIN = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:6]}"
+
+ALL = "*"
+
+# Table -> column whose value names the partition a row belongs to
+PARTITION_COLUMNS = {
+    "users": "class_id",
+    "class_subjects": "class_id",
+    "schedule_slots": "class_id",
+}
+
+# Ids are handed out at insert but become visible at commit: on databases with
+# concurrent writers a lower id can appear after a higher one. Rows this far
+# below the newest one seen are read again (and skipped if already applied).
+LOOKBACK_IDS = 200
+
+_PENDING_KEY = "invalidation_tags"
+_EVENTS_KEY = "invalidation_events"
+_CHANGE_ID_KEY = "invalidation_change_id"
+_change_log = models.ChangeLog.__table__
+_subscribers: List[Callable[[Set[str]], None]] = []
+# Called with (change id, events)
+_event_subscribers: List[Callable[[int, List[Dict]], None]] = []
+
+
+def subscribe(callback: Callable[[Set[str]], None]):
+    _subscribers.append(callback)
+
+
+def subscribe_events(callback: Callable[[int, List[Dict]], None]):
+    _event_subscribers.append(callback)
+
+
+def notify(tags: Set[str]):
+    """Tell this process's subscribers (never raises: a failing cache must not fail the write)."""
+    for callback in _subscribers:
+        try:
+            callback(tags)
+        except Exception:
+            logger.exception("Invalidation subscriber %r failed", callback)
+
+
+def notify_events(change_id: int, events: List[Dict]):
+    for callback in _event_subscribers:
+        try:
+            callback(change_id, events)
+        except Exception:
+            logger.exception("Event subscriber %r failed", callback)
+
+
+def publish(conn: Connection, tags: Set[str], events: Optional[List[Dict]] = None) -> int:
+    """Record a change in the caller's transaction. Other workers see it once it commits. Returns its id."""
+    result = conn.execute(insert(_change_log).values(
+        tags=json.dumps(sorted(tags)),
+        events=json.dumps(events, default=str) if events else None,
+        origin=ORIGIN,
+        created_at=datetime.utcnow(),
+    ))
+    return result.inserted_primary_key[0]
+
+
+def announce(engine: Engine, tags: Set[str] = frozenset({ALL})):
+    """Publish and notify, for writes made outside a Session (default: everything changed)."""
+    with engine.begin() as conn:
+        publish(conn, set(tags))
+    notify(set(tags))
+
+
+def add_events(session: Session, events: List[Dict]):
+    """Attach push events to the session's pending change; they are published if it commits."""
+    session = getattr(session, "sync_session", session) # AsyncSession
+    session.info.setdefault(_EVENTS_KEY, []).extend(events)
+
+
+# --- Tags from session writes ---
+
+def _row_tags(obj, tags: Set[str]):
+    state = sa_inspect(obj)
+    table = state.mapper.local_table.name
+    tags.add(table)
+    column = PARTITION_COLUMNS.get(table)
+    if column is None:
+        return
+    # Old and new partition when the row moved (e.g. a student changing class)
+    history = state.attrs[column].history
+    values = {*history.added, *history.unchanged, *history.deleted}
+    if not values:
+        values = {"*"} # Column never loaded: the partition is unknown
+    tags.update(f"{table}:{value}" for value in values)
+
+
+def _pending(session: Session) -> Set[str]:
+    return session.info.setdefault(_PENDING_KEY, set())
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed(session, flush_context):
+    tags = _pending(session)
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if obj in session.new or obj in session.deleted or session.is_modified(obj):
+            _row_tags(obj, tags)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    name = getattr(getattr(orm_execute_state.statement, "table", None), "name", None)
+    if name:
+        _pending(orm_execute_state.session).update((name, f"{name}:*"))
+
+
+@event.listens_for(Session, "before_commit")
+def _publish_pending(session):
+    # Flush now so the last changes are tagged before the row is written
+    session.flush()
+    tags = session.info.get(_PENDING_KEY)
+    events = session.info.get(_EVENTS_KEY)
+    if tags or events:
+        # Through the connection, not the session: the insert itself is not tagged
+        session.info[_CHANGE_ID_KEY] = publish(session.connection(), tags or set(), events)
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_committed(session):
+    tags = session.info.pop(_PENDING_KEY, None)
+    events = session.info.pop(_EVENTS_KEY, None)
+    change_id = session.info.pop(_CHANGE_ID_KEY, None)
+    if tags:
+        notify(tags)
+    if events and change_id is not None:
+        notify_events(change_id, events)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    for key in (_PENDING_KEY, _EVENTS_KEY, _CHANGE_ID_KEY):
+        session.info.pop(key, None)
+
+
+# --- Polling ---
+
+class ChangeLogPoller(threading.Thread):
+    def __init__(self, engine: Engine, interval: float = POLL_INTERVAL):
+        super().__init__(name="invalidation-poller", daemon=True)
+        self.engine = engine
+        self.interval = interval
+        self.last_seen: Optional[int] = None
+        self._applied: Set[int] = set()
+        self._stop_event = threading.Event()
+        self._last_prune = time.monotonic()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.poll()
+            except Exception:
+                # Typically the table being recreated (seeding) or a locked database: retry next time
+                logger.warning("Change log poll failed", exc_info=True)
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+
+    def start(self):
+        # Changes committed before start are irrelevant: every cache starts empty
+        with self.engine.connect() as conn:
+            self.last_seen = conn.scalar(select(func.max(_change_log.c.id))) or 0
+        super().start()
+
+    def poll(self):
+        tags: Set[str] = set()
+        events = []
+        with self.engine.connect() as conn:
+            newest = conn.scalar(select(func.max(_change_log.c.id))) or 0
+            oldest = conn.scalar(select(func.min(_change_log.c.id)))
+            if newest < self.last_seen or (oldest is not None and oldest > self.last_seen + 1 and self.last_seen):
+                # Table recreated, or rows we never read were pruned
+                tags.add(ALL)
+                self.last_seen = newest
+                self._applied.clear()
+            else:
+                rows = conn.execute(
+                    select(_change_log.c.id, _change_log.c.tags, _change_log.c.events, _change_log.c.origin)
+                    .where(_change_log.c.id > self.last_seen - LOOKBACK_IDS)
+                    .order_by(_change_log.c.id)
+                )
+                for row_id, row_tags, row_events, origin in rows:
+                    if row_id in self._applied:
+                        continue
+                    self._applied.add(row_id)
+                    # This process notified itself at commit time
+                    if origin != ORIGIN:
+                        tags.update(json.loads(row_tags))
+                        if row_events:
+                            events.append((row_id, json.loads(row_events)))
+                    self.last_seen = max(self.last_seen, row_id)
+                self._applied = {i for i in self._applied if i > self.last_seen - LOOKBACK_IDS}
+        if tags:
+            notify(tags)
+        for change_id, change_events in events:
+            notify_events(change_id, change_events)
+        self._prune()
+
+    def _prune(self):
+        now = time.monotonic()
+        if now - self._last_prune < PRUNE_EVERY:
+            return
+        self._last_prune = now
+        with self.engine.begin() as conn:
+            conn.execute(delete(_change_log).where(_change_log.c.created_at < datetime.utcnow() - RETENTION))
+
+
+_poller: Optional[ChangeLogPoller] = None
+
+
+def start_polling(engine: Engine):
+    """Start this process's poller (idempotent). INVALIDATION_POLL_MS=0 disables it."""
+    global _poller
+    if POLL_INTERVAL <= 0 or _poller is not None:
+        return
+    _poller = ChangeLogPoller(engine)
+    _poller.start()
+
+
+def stop_polling():
+    global _poller
+    if _poller is not None:
+        _poller.stop()
+        _poller = None
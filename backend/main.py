@@ -1,16 +1,31 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 import os
 from fastapi.middleware.cors import CORSMiddleware
-from .routers import auth, api, classes, students, schedule, curriculum, users
-from .database import engine, Base
+from .routers import auth, api, classes, students, schedule, curriculum, users, exports, search, admin, events, announcements, grades, metrics as metrics_router
+from .database import engine
+from .async_database import async_engine
+from .metrics import MetricsMiddleware, instrument_engine
+from .profiling import ProfilingMiddleware
+from .migrations import upgrade_database
+from . import invalidation
+from .search import ensure_index
 
-# Create tables on startup
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Bring the schema up to date before serving requests
+    upgrade_database(engine)
+    ensure_index(engine)
+    # Keeps this worker's caches in step with writes committed by the others
+    invalidation.start_polling(engine)
+    yield
+    invalidation.stop_polling()
 
 app = FastAPI(
     title="NextGen School API",
     description="Backend for the NextGen School Dashboard",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS Configuration
@@ -21,6 +36,10 @@ origins = [
     "http://127.0.0.1:3001",
 ]
 
+# Query counting/timing for both the sync and the async engine
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=os.getenv("ALLOWED_ORIGINS", "*").split(","),
@@ -28,6 +47,10 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Profiles requests sent with X-Profile by a principal (or PROFILE_SAMPLE_RATE of all)
+app.add_middleware(ProfilingMiddleware)
+# Added last so it wraps everything, CORS included
+app.add_middleware(MetricsMiddleware)
 
 # Include Routers
 app.include_router(auth.router)
@@ -37,6 +60,13 @@ app.include_router(students.router)
 app.include_router(schedule.router)
 app.include_router(curriculum.router)
 app.include_router(users.router)
+app.include_router(exports.router)
+app.include_router(search.router)
+app.include_router(metrics_router.router)
+app.include_router(admin.router)
+app.include_router(events.router)
+app.include_router(announcements.router)
+app.include_router(grades.router)
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,223 @@
+"""
+Request and SQL instrumentation.
+
+`MetricsMiddleware` times every HTTP request and records a latency histogram
+per route template (e.g. /classes/{class_id}). SQLAlchemy cursor events on the
+instrumented engines count and time each statement and charge it to the
+request that issued it, through a context variable. Sync endpoints run in a
+copied context, so this works for them too. Each response carries a
+`Server-Timing` header (total, db time and query count). `render_prometheus`
+produces the text exposition served at /metrics. Event streams
+(text/event-stream) are counted but kept out of the latency histogram: their
+duration is how long the client stayed connected.
+
+Metrics live in process memory: with several workers each one reports its own.
+"""
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import Headers, MutableHeaders
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def route_template(scope) -> Optional[str]:
+    """Path template of the matched route, e.g. /api/bootstrap or /classes/{class_id}."""
+    template = getattr(scope.get("route"), "path", None)
+    if template is None:
+        return None
+    # Newer FastAPI reports routes of included routers without the include prefix:
+    # recover it from the request path
+    rendered = template
+    for name, value in scope.get("path_params", {}).items():
+        rendered = rendered.replace("{" + name + "}", str(value))
+    path = scope["path"]
+    if path != rendered and path.endswith(rendered):
+        template = path[:len(path) - len(rendered)] + template
+    return template
+
+
+def is_event_stream(message) -> bool:
+    """Whether an http.response.start message opens a server-sent event stream."""
+    content_type = Headers(raw=message.get("headers", [])).get("content-type", "")
+    return content_type.startswith("text/event-stream")
+
+
+class RequestStats:
+    """Per-request accumulator, shared by the middleware and the engine hooks."""
+    __slots__ = ("method", "scope", "_route", "queries", "db_seconds")
+
+    def __init__(self, scope):
+        self.method = scope["method"]
+        self.scope = scope
+        self._route: Optional[str] = None
+        self.queries = 0
+        self.db_seconds = 0.0
+
+    @property
+    def route(self) -> Optional[str]:
+        # Known once the router has matched (the scope is updated in place)
+        if self._route is None:
+            self._route = route_template(self.scope)
+        return self._route
+
+    def server_timing(self, total_seconds: float) -> str:
+        return (f'app;dur={total_seconds * 1000:.1f}, '
+                f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} queries"')
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request() -> Optional[RequestStats]:
+    return _current.get()
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.queries: Dict[Tuple[str, str], Histogram] = {}
+        self.db_seconds: Dict[Tuple[str, str], float] = {}
+        self.responses: Dict[Tuple[str, str, str], int] = {}
+
+    def observe_request(self, stats: RequestStats, status: int, seconds: Optional[float]):
+        """seconds is None for responses whose duration isn't a latency (event streams)."""
+        key = (stats.method, stats.route or UNMATCHED_ROUTE)
+        with self._lock:
+            if seconds is not None:
+                self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.queries.setdefault(key, Histogram(QUERY_COUNT_BUCKETS)).observe(stats.queries)
+            self.db_seconds[key] = self.db_seconds.get(key, 0.0) + stats.db_seconds
+            status_key = key + (str(status),)
+            self.responses[status_key] = self.responses.get(status_key, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self.latency.clear()
+            self.queries.clear()
+            self.db_seconds.clear()
+            self.responses.clear()
+
+
+registry = Registry()
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (no BaseHTTPMiddleware), so streaming responses pass through untouched."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = _current.set(stats)
+        start = time.perf_counter()
+        status = 500
+        streaming = False
+
+        async def send_with_timing(message):
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                streaming = is_event_stream(message)
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", stats.server_timing(time.perf_counter() - start))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            registry.observe_request(stats, status, None if streaming else time.perf_counter() - start)
+            _current.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+
+
+def instrument_engine(engine: Engine):
+    """Count and time every statement on a (sync) engine. For an AsyncEngine pass engine.sync_engine."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+def _labels(**labels) -> str:
+    def escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _histogram_lines(name: str, series: Dict[Tuple[str, str], Histogram]) -> List[str]:
+    lines = []
+    for (method, route), hist in sorted(series.items()):
+        cumulative = 0
+        for bound, count in zip(hist.buckets + (float("inf"),), hist.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{name}_bucket{_labels(method=method, route=route, le=le)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(method=method, route=route)} {hist.sum}")
+        lines.append(f"{name}_count{_labels(method=method, route=route)} {hist.count}")
+    return lines
+
+
+def render_prometheus() -> str:
+    with registry._lock:
+        lines = [
+            "# HELP http_request_duration_seconds HTTP request latency by route.",
+            "# TYPE http_request_duration_seconds histogram",
+            *_histogram_lines("http_request_duration_seconds", registry.latency),
+            "# HELP http_responses_total HTTP responses by route and status code.",
+            "# TYPE http_responses_total counter",
+            *[f"http_responses_total{_labels(method=m, route=r, status=s)} {n}"
+              for (m, r, s), n in sorted(registry.responses.items())],
+            "# HELP db_queries_per_request SQL statements executed per request.",
+            "# TYPE db_queries_per_request histogram",
+            *_histogram_lines("db_queries_per_request", registry.queries),
+            "# HELP db_query_seconds_total Time spent in SQL statements by route.",
+            "# TYPE db_query_seconds_total counter",
+            *[f"db_query_seconds_total{_labels(method=m, route=r)} {s}"
+              for (m, r), s in sorted(registry.db_seconds.items())],
+        ]
+    return "\n".join(lines) + "\n"
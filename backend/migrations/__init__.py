@@ -0,0 +1,111 @@
+"""
+Versioned, idempotent schema migrations.
+
+Each migration is a module `mNNNN_<name>.py` in this package that defines
+`upgrade(conn)`. Applied versions are recorded in `schema_migrations`, and
+`upgrade_database` runs only the missing ones, each in its own transaction
+(DDL included, on SQLite too: see `_transactional`).
+Tables that don't exist yet are created from the models first. Migrations
+must therefore tolerate a schema that is already up to date (IF NOT EXISTS,
+checking columns before adding them).
+
+    python -m backend.migrations          # apply pending migrations
+    python -m backend.migrations --list   # show status
+"""
+import importlib
+import pkgutil
+import re
+from contextlib import contextmanager
+from datetime import datetime
+from types import ModuleType
+from typing import List, Tuple
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, create_engine, event, insert, inspect, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import NullPool
+
+MIGRATION_MODULE_RE = re.compile(r"^m(\d{4})_(\w+)$")
+
+# Kept out of models.Base so create_all never touches it
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def discover() -> List[Tuple[int, str, ModuleType]]:
+    migrations = []
+    for info in pkgutil.iter_modules(__path__):
+        match = MIGRATION_MODULE_RE.match(info.name)
+        if match:
+            module = importlib.import_module(f"{__name__}.{info.name}")
+            migrations.append((int(match.group(1)), match.group(2), module))
+    return sorted(migrations, key=lambda m: m[0])
+
+
+def applied_versions(engine: Engine) -> set:
+    if not inspect(engine).has_table(schema_migrations.name):
+        return set()
+    with engine.connect() as conn:
+        return {version for (version,) in conn.execute(select(schema_migrations.c.version))}
+
+
+@contextmanager
+def _transactional(engine: Engine):
+    """
+    Engine whose transactions cover DDL. pysqlite only opens a transaction
+    before DML, so a CREATE INDEX would commit on its own and a migration that
+    fails later would leave it behind. On SQLite this is a separate engine with
+    the driver's own transaction handling off and an explicit BEGIN (the
+    SQLAlchemy pysqlite recipe). IMMEDIATE makes a second worker wait for the
+    first one's migration instead of failing on a lock upgrade.
+    """
+    if engine.dialect.name != "sqlite" or engine.dialect.driver != "pysqlite":
+        yield engine
+        return
+    from ..database import apply_sqlite_pragmas
+
+    migration_engine = create_engine(engine.url, poolclass=NullPool)
+
+    @event.listens_for(migration_engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        apply_sqlite_pragmas(dbapi_connection)
+
+    @event.listens_for(migration_engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    try:
+        yield migration_engine
+    finally:
+        migration_engine.dispose()
+
+
+def upgrade_database(engine: Engine) -> List[str]:
+    """Create missing tables, then apply pending migrations in order. Returns the names applied."""
+    from .. import models # noqa: F401 (registers every table on Base.metadata)
+    from ..database import Base
+
+    Base.metadata.create_all(bind=engine)
+    _metadata.create_all(bind=engine)
+    done = applied_versions(engine)
+    applied = []
+    pending = [m for m in discover() if m[0] not in done]
+    if not pending:
+        return applied
+    with _transactional(engine) as migration_engine:
+        for version, name, module in pending:
+            try:
+                with migration_engine.begin() as conn:
+                    module.upgrade(conn)
+                    conn.execute(insert(schema_migrations).values(version=version, name=name, applied_at=datetime.utcnow()))
+            except IntegrityError:
+                # Another worker recorded this version first; its transaction did the work
+                continue
+            applied.append(f"{version:04d}_{name}")
+    return applied
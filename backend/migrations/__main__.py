@@ -0,0 +1,26 @@
+import argparse
+from ..database import engine
+from . import applied_versions, discover, upgrade_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations")
+    parser.add_argument("--list", action="store_true", help="show migrations and whether they are applied")
+    args = parser.parse_args()
+
+    if args.list:
+        done = applied_versions(engine)
+        for version, name, _ in discover():
+            print(f"[{'x' if version in done else ' '}] {version:04d}_{name}")
+        return
+
+    applied = upgrade_database(engine)
+    if applied:
+        for name in applied:
+            print(f"Applied {name}")
+    else:
+        print("Database is up to date.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+"""Teacher scheduling columns on users (previously added by migrate_db.py)."""
+from sqlalchemy import inspect
+
+
+def upgrade(conn):
+    columns = {c["name"] for c in inspect(conn).get_columns("users")}
+    if "max_weekly_hours" not in columns:
+        conn.exec_driver_sql("ALTER TABLE users ADD COLUMN max_weekly_hours INTEGER DEFAULT 20")
+    if "specialization" not in columns:
+        conn.exec_driver_sql("ALTER TABLE users ADD COLUMN specialization VARCHAR")
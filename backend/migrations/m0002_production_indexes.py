@@ -0,0 +1,34 @@
+"""
+Indexes for the filters the routers run on every request. Names match the
+Index/index=True declarations in models.py, so fresh databases built by
+create_all end up identical.
+"""
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_schedule_slots_class_id ON schedule_slots (class_id)",
+    "CREATE INDEX IF NOT EXISTS ix_schedule_slots_day_slot ON schedule_slots (day_of_week, slot_index)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_teacher_availability_slot ON teacher_availability (teacher_id, day_of_week, slot_index)",
+    "CREATE INDEX IF NOT EXISTS ix_class_subjects_class_id ON class_subjects (class_id)",
+    "CREATE INDEX IF NOT EXISTS ix_class_subjects_teacher_id ON class_subjects (teacher_id)",
+    "CREATE INDEX IF NOT EXISTS ix_grades_student_subject ON grades (student_id, subject)",
+    "CREATE INDEX IF NOT EXISTS ix_invoices_status ON invoices (status)",
+    "CREATE INDEX IF NOT EXISTS ix_invoices_parent_id ON invoices (parent_id)",
+    "CREATE INDEX IF NOT EXISTS ix_users_role ON users (role)",
+    "CREATE INDEX IF NOT EXISTS ix_users_class_id ON users (class_id)",
+]
+
+
+def upgrade(conn):
+    # The unique availability index fails on existing duplicates: keep one row per slot
+    conn.exec_driver_sql("""
+        DELETE FROM teacher_availability
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM teacher_availability
+            GROUP BY teacher_id, day_of_week, slot_index
+        )
+    """)
+    for statement in INDEXES:
+        conn.exec_driver_sql(statement)
+    if conn.dialect.name == "sqlite":
+        # Refresh planner statistics so the new indexes are actually chosen
+        conn.exec_driver_sql("ANALYZE")
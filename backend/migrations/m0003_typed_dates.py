@@ -0,0 +1,53 @@
+"""
+Grade.date, Invoice.due_date and Announcement.date become DATE columns with
+range indexes. Postgres converts the column type. SQLite has no column types
+to alter (SQLAlchemy's Date stores 'YYYY-MM-DD' text), so there the stored
+values are normalised to that form, which keeps them range-comparable.
+Values that aren't a date at all can't be read back as one: they are copied
+to `invalid_dates` (table, row id, column, original text) and set to NULL,
+and the number of rows is logged. Postgres refuses the cast on such values,
+so there the migration fails and nothing changes.
+"""
+import logging
+from sqlalchemy import Date, inspect
+
+logger = logging.getLogger(__name__)
+
+DATE_COLUMNS = [
+    ("grades", "date", "ix_grades_date"),
+    ("invoices", "due_date", "ix_invoices_due_date"),
+    ("announcements", "date", "ix_announcements_date"),
+]
+
+
+def upgrade(conn):
+    inspector = inspect(conn)
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql(
+            "CREATE TABLE IF NOT EXISTS invalid_dates "
+            "(table_name TEXT NOT NULL, row_id TEXT NOT NULL, column_name TEXT NOT NULL, value TEXT)"
+        )
+    for table, column, index in DATE_COLUMNS:
+        if conn.dialect.name == "sqlite":
+            # '2025-12-01T10:00:00' -> '2025-12-01'
+            conn.exec_driver_sql(
+                f"UPDATE {table} SET {column} = substr({column}, 1, 10) "
+                f"WHERE length({column}) > 10 AND date(substr({column}, 1, 10)) = substr({column}, 1, 10)"
+            )
+            # Anything else that isn't a date: keep the original text, then NULL
+            invalid = f"{column} IS NOT NULL AND ({column} = '' OR date({column}) IS NULL OR date({column}) != {column})"
+            conn.exec_driver_sql(
+                f"INSERT INTO invalid_dates (table_name, row_id, column_name, value) "
+                f"SELECT '{table}', id, '{column}', {column} FROM {table} WHERE {invalid}"
+            )
+            moved = conn.exec_driver_sql(f"UPDATE {table} SET {column} = NULL WHERE {invalid}").rowcount
+            if moved:
+                logger.warning("%d %s.%s values aren't dates: set to NULL, originals kept in invalid_dates",
+                               moved, table, column)
+        else:
+            current = next(c["type"] for c in inspector.get_columns(table) if c["name"] == column)
+            if not isinstance(current, Date):
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {table} ALTER COLUMN {column} TYPE DATE USING NULLIF({column}, '')::date"
+                )
+        conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {index} ON {table} ({column})")
@@ -0,0 +1,8 @@
+"""Push event payloads on change_log rows (the table itself comes from create_all)."""
+from sqlalchemy import inspect
+
+
+def upgrade(conn):
+    columns = {c["name"] for c in inspect(conn).get_columns("change_log")}
+    if "events" not in columns:
+        conn.exec_driver_sql("ALTER TABLE change_log ADD COLUMN events TEXT")
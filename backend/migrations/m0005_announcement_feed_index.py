@@ -0,0 +1,9 @@
+"""Composite index behind GET /announcements (one range scan per class, newest first)."""
+
+
+def upgrade(conn):
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_announcements_target_date ON announcements (target_class_id, date)"
+    )
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("ANALYZE announcements")
@@ -0,0 +1,6 @@
+"""Fill grade_aggregates (created from the models) from the grades already stored."""
+from ..gradebook import refresh_aggregates
+
+
+def upgrade(conn):
+    refresh_aggregates(conn)
@@ -0,0 +1,20 @@
+"""
+One grade per (student, subject, date): the key `gradebook.upsert_grades`
+writes on, enforced so concurrent batches can't both insert the same cell.
+Duplicates already stored are not merged automatically: the migration fails
+and names how many cells need cleaning up.
+"""
+
+
+def upgrade(conn):
+    duplicates = conn.exec_driver_sql(
+        "SELECT count(*) FROM (SELECT 1 FROM grades GROUP BY student_id, subject, date HAVING count(*) > 1) d"
+    ).scalar()
+    if duplicates:
+        raise RuntimeError(
+            f"{duplicates} (student, subject, date) cells have more than one grade: "
+            "keep one grade per cell, then restart to apply this migration"
+        )
+    conn.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_grades_cell ON grades (student_id, subject, date)"
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Enum, ForeignKey, Float, Table, Date
+from sqlalchemy import Column, Integer, String, Enum, ForeignKey, Float, Table, Date, DateTime, Index, Text
 from sqlalchemy.orm import relationship
 from .database import Base
 import enum
@@ -42,7 +42,7 @@ class User(Base):
     name = Column(String, index=True)
     email = Column(String, unique=True, index=True)
     hashed_password = Column(String)
-    role = Column(Enum(UserRole))
+    role = Column(Enum(UserRole), index=True)
     avatar = Column(String, nullable=True)
     
     # Teacher specific
@@ -50,7 +50,7 @@ class User(Base):
     specialization = Column(String, nullable=True) # Comma separated: "MATH,SCIENCE"
     
     # Student specific
-    class_id = Column(String, ForeignKey("class_groups.id"), nullable=True)
+    class_id = Column(String, ForeignKey("class_groups.id"), nullable=True, index=True)
     
     # Relationships
     student_class = relationship("ClassGroup", foreign_keys=[class_id], back_populates="students")
@@ -94,39 +94,56 @@ class ClassGroup(Base):
 
 class Grade(Base):
     __tablename__ = "grades"
+    __table_args__ = (
+        Index("ix_grades_student_subject", "student_id", "subject"),
+        # One grade per cell, see gradebook.upsert_grades
+        Index("ux_grades_cell", "student_id", "subject", "date", unique=True),
+    )
 
     id = Column(String, primary_key=True, index=True)
     student_id = Column(String, ForeignKey("users.id"))
     subject = Column(String)
     score = Column(Float)
     feedback = Column(String)
-    date = Column(String) # Storing as ISO string to match frontend simplicity, or could use Date
+    date = Column(Date, index=True) # Serialized as 'YYYY-MM-DD', as the frontend expects
 
     student = relationship("User", back_populates="grades")
 
+class GradeAggregate(Base):
+    """Running totals of the grades of one class in one subject (see gradebook.py)"""
+    __tablename__ = "grade_aggregates"
+
+    class_id = Column(String, ForeignKey("class_groups.id"), primary_key=True)
+    subject = Column(String, primary_key=True)
+    count = Column(Integer, default=0)
+    total = Column(Float, default=0.0) # Sum of scores
+    total_sq = Column(Float, default=0.0) # Sum of squared scores, for the standard deviation
+
 class Invoice(Base):
     __tablename__ = "invoices"
 
     id = Column(String, primary_key=True, index=True)
-    parent_id = Column(String, ForeignKey("users.id"))
+    parent_id = Column(String, ForeignKey("users.id"), index=True)
     student_id = Column(String, ForeignKey("users.id"))
     amount = Column(Float)
     currency = Column(String, default='EUR')
-    status = Column(Enum(InvoiceStatus), default=InvoiceStatus.PENDING)
+    status = Column(Enum(InvoiceStatus), default=InvoiceStatus.PENDING, index=True)
     type = Column(Enum(InvoiceType))
-    due_date = Column(String)
+    due_date = Column(Date, index=True)
 
     parent = relationship("User", foreign_keys=[parent_id], back_populates="invoices")
     student = relationship("User", foreign_keys=[student_id])
 
 class Announcement(Base):
     __tablename__ = "announcements"
+    # Feed: newest announcements of one class (or school-wide, NULL) first
+    __table_args__ = (Index("ix_announcements_target_date", "target_class_id", "date"),)
 
     id = Column(String, primary_key=True, index=True)
     author_id = Column(String, ForeignKey("users.id"))
     title = Column(String)
     content = Column(String)
-    date = Column(String)
+    date = Column(Date, index=True)
     target_class_id = Column(String, ForeignKey("class_groups.id"), nullable=True)
 
     author = relationship("User", foreign_keys=[author_id])
@@ -137,6 +154,7 @@ class Announcement(Base):
 
 class TeacherAvailability(Base):
     __tablename__ = "teacher_availability"
+    __table_args__ = (Index("ux_teacher_availability_slot", "teacher_id", "day_of_week", "slot_index", unique=True),)
 
     id = Column(String, primary_key=True, index=True)
     teacher_id = Column(String, ForeignKey("users.id"))
@@ -149,9 +167,9 @@ class ClassSubject(Base):
     __tablename__ = "class_subjects"
 
     id = Column(String, primary_key=True, index=True)
-    class_id = Column(String, ForeignKey("class_groups.id"))
+    class_id = Column(String, ForeignKey("class_groups.id"), index=True)
     name = Column(String) # e.g. "Math"
-    teacher_id = Column(String, ForeignKey("users.id"), nullable=True) # Specific teacher for this subject
+    teacher_id = Column(String, ForeignKey("users.id"), nullable=True, index=True) # Specific teacher for this subject
     hours_weekly = Column(Integer, default=1)
     
     class_group = relationship("ClassGroup", back_populates="subjects")
@@ -159,9 +177,10 @@ class ClassSubject(Base):
 
 class ScheduleSlot(Base):
     __tablename__ = "schedule_slots"
+    __table_args__ = (Index("ix_schedule_slots_day_slot", "day_of_week", "slot_index"),)
 
     id = Column(String, primary_key=True, index=True)
-    class_id = Column(String, ForeignKey("class_groups.id"))
+    class_id = Column(String, ForeignKey("class_groups.id"), index=True)
     subject_id = Column(String, ForeignKey("class_subjects.id"))
     day_of_week = Column(String) # MON, TUE, WED, THU, FRI
     slot_index = Column(Integer) # 1-8
@@ -177,3 +196,19 @@ class SubjectTemplate(Base):
     default_hours = Column(Float, default=1.0) # Changed to Float to support 5.25 etc
     education_level = Column(Enum(EducationLevel))
     grade = Column(Integer, nullable=True) # 1, 2, 3... for specific grade levels
+
+class CacheVersion(Base):
+    __tablename__ = "cache_versions"
+
+    name = Column(String, primary_key=True) # e.g. "subject_templates"
+    stamp = Column(String) # Random token, replaced on every write to the cached data
+
+class ChangeLog(Base):
+    """Cache tags touched by each committed write, polled by every worker (see invalidation.py)"""
+    __tablename__ = "change_log"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    tags = Column(Text) # JSON list, e.g. ["users", "users:class_1"]
+    events = Column(Text, nullable=True) # JSON list of push events for the event stream (see events.py)
+    origin = Column(String) # Process that committed the write
+    created_at = Column(DateTime, index=True)
@@ -0,0 +1,210 @@
+"""
+On-demand request profiling.
+
+A request is profiled when it carries the PROFILE_HEADER header (default
+`X-Profile: 1`) together with a principal's bearer token, or at random for a
+PROFILE_SAMPLE_RATE fraction of requests (default 0, i.e. never). While it
+runs, a sampler thread snapshots the Python stacks every PROFILE_INTERVAL_MS.
+Threads parked in a wait or select are skipped. The samples are written to
+PROFILE_DIR as collapsed stacks ("frame;frame;frame count"), which
+flamegraph.pl, speedscope and similar tools read directly. A JSON sidecar
+holds the route and timing. Only the newest PROFILE_KEEP profiles are kept.
+
+The sampler sees every thread of the worker, so requests running
+concurrently on the same worker can show up in a profile. One profile runs
+at a time per worker; further triggers are ignored until it finishes. An
+event stream (text/event-stream) never finishes: its profile is dropped as
+soon as the response starts, which frees the slot for other requests.
+"""
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+from uuid import uuid4
+from fastapi.concurrency import run_in_threadpool
+from jose import JWTError, jwt
+from starlette.datastructures import Headers, MutableHeaders
+from . import auth_utils, models
+from .database import SessionLocal
+from .metrics import is_event_stream, route_template
+
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "X-Profile")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", 5)) / 1000
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 50))
+
+PROFILE_NAME_RE = re.compile(r"^[0-9T]+_[0-9a-f]{8}$")
+
+# Leaf frames of threads that are idle rather than working
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("core.py", "_connection_worker_thread"), # aiosqlite, blocked on its request queue
+}
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler(threading.Thread):
+    """Samples the stacks of all other threads until stopped."""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        while not self._stop_event.wait(self.interval):
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _is_principal(token: str) -> bool:
+    try:
+        email = jwt.decode(token, auth_utils.SECRET_KEY, algorithms=[auth_utils.ALGORITHM]).get("sub")
+    except JWTError:
+        return False
+    if not email:
+        return False
+    db = SessionLocal()
+    try:
+        role = db.query(models.User.role).filter(models.User.email == email).scalar()
+    finally:
+        db.close()
+    return role == models.UserRole.PRINCIPAL
+
+
+def _save(profile_id: str, sampler: StackSampler, meta: Dict):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.collapsed"), "w") as f:
+        f.write(sampler.collapsed())
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), "w") as f:
+        json.dump(meta, f)
+    for old in list_profiles()[PROFILE_KEEP:]:
+        for ext in (".collapsed", ".json"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, old["id"] + ext))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles() -> List[Dict]:
+    """Stored profiles, newest first."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(PROFILE_DIR):
+        if name.endswith(".json") and PROFILE_NAME_RE.match(name[:-5]):
+            with open(os.path.join(PROFILE_DIR, name)) as f:
+                profiles.append(json.load(f))
+    return sorted(profiles, key=lambda p: p["id"], reverse=True)
+
+
+def profile_path(profile_id: str) -> Optional[str]:
+    if not PROFILE_NAME_RE.match(profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.collapsed")
+    return path if os.path.exists(path) else None
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self._busy = threading.Lock()
+
+    async def _should_profile(self, scope) -> Optional[str]:
+        if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+            return "sampled"
+        headers = Headers(scope=scope)
+        if headers.get(PROFILE_HEADER) not in ("1", "true"):
+            return None
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and await run_in_threadpool(_is_principal, token):
+            return "header"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trigger = await self._should_profile(scope)
+        if trigger is None or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        started_at = datetime.utcnow()
+        profile_id = f"{started_at.strftime('%Y%m%dT%H%M%S')}_{uuid4().hex[:8]}"
+        status = 500
+        sampler = StackSampler()
+        dropped = False
+
+        async def send_with_id(message):
+            nonlocal status, dropped
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if is_event_stream(message):
+                    # Open for as long as the client listens: don't hold the sampler and the slot
+                    dropped = True
+                    sampler.stop()
+                    self._busy.release()
+                else:
+                    MutableHeaders(scope=message).append("X-Profile-Id", profile_id)
+            await send(message)
+
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            if not dropped:
+                sampler.stop()
+                meta = {
+                    "id": profile_id,
+                    "created": started_at.isoformat(timespec="seconds"),
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": route_template(scope),
+                    "status": status,
+                    "trigger": trigger,
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+                    "samples": sampler.samples,
+                }
+                try:
+                    await run_in_threadpool(_save, profile_id, sampler, meta)
+                finally:
+                    self._busy.release()
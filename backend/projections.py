@@ -0,0 +1,57 @@
+"""
+Column projections for the user list endpoints.
+
+Directory-style endpoints only need a handful of user columns. Selecting those
+columns as tuples skips building User objects (password hash, lazy
+relationships) and validating them through UserResponse. Clients pick the
+columns with a sparse fieldset, e.g. `?fields=id,name,avatar`.
+"""
+from typing import Dict, Iterable, List, Optional
+from fastapi import HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.sql import Select
+from . import models
+
+USER_FIELDS = {
+    "id": models.User.id,
+    "name": models.User.name,
+    "email": models.User.email,
+    "role": models.User.role,
+    "avatar": models.User.avatar,
+    "class_id": models.User.class_id,
+    "max_weekly_hours": models.User.max_weekly_hours,
+    "specialization": models.User.specialization,
+}
+
+# Matches schemas.UserSummary
+USER_SUMMARY_FIELDS = ["id", "name", "role", "avatar", "class_id"]
+
+
+def parse_fields(fields: Optional[str], default: Optional[List[str]] = None) -> Optional[List[str]]:
+    """'id,name' -> ['id', 'name']; `default` when not given. Raises ValueError for unknown fields."""
+    if not fields:
+        return default
+    names = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in names if f not in USER_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+
+def sparse_fields(
+    fields: Optional[str] = Query(None, description="Comma separated user fields, e.g. id,name,avatar")
+) -> Optional[List[str]]:
+    """Dependency for the `fields=` parameter: None means the endpoint's full response."""
+    try:
+        return parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def user_projection(names: List[str], *filters) -> Select:
+    return select(*[USER_FIELDS[n] for n in names]).where(*filters).order_by(models.User.name)
+
+
+def as_dicts(names: List[str], rows: Iterable[tuple]) -> List[Dict]:
+    # UserRole is a str enum, so rows serialize with the plain JSON encoder
+    return [dict(zip(names, row)) for row in rows]
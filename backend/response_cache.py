@@ -0,0 +1,274 @@
+"""
+Tag-based cache for serialized GET responses.
+
+`@cached(response_model, depends=...)` goes under the route decorator of a
+read endpoint. The entry key is the endpoint, its query/path parameters and,
+with `scope=`, a value derived from the caller (e.g. their id when the result
+depends on who asks). Entries keep the final JSON bytes, so a hit skips the
+queries and the serialization. Responses carry `X-Cache: HIT` or `MISS`.
+
+Entries are tagged with the tables they read ("class_groups"), or with one
+partition of a table ("users:{class_id}", formatted from the endpoint's
+parameters). The cache subscribes to the invalidation bus (invalidation.py).
+The bus derives tags from every committed write, in this worker or another
+one, and the entries with those tags are dropped.
+
+Memory is bounded LRU (RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES).
+With RESPONSE_CACHE_DIR set, entries are also written to a SQLite file there,
+so they survive restarts and are shared by the workers of one host.
+RESPONSE_CACHE=0 disables caching.
+"""
+import functools
+import inspect
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from fastapi import Response
+from pydantic import TypeAdapter
+from . import invalidation, models
+
+ENABLED = os.getenv("RESPONSE_CACHE", "1").lower() not in ("0", "false", "no", "off")
+MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 2048))
+MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+CACHE_DIR = os.getenv("RESPONSE_CACHE_DIR")
+
+# Endpoint arguments that never go into the key
+NOT_KEYED = {"db", "current_user"}
+
+# (body, media type)
+Entry = Tuple[bytes, str]
+
+
+class _DiskStore:
+    """Second tier in a local SQLite file, shared by every process that opens it."""
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, "responses.sqlite"), check_same_thread=False,
+                                     isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, body BLOB, media_type TEXT, stored REAL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS entry_tags (tag TEXT, key TEXT)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_entry_tags_tag ON entry_tags (tag)")
+        self._writes = 0
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            row = self._conn.execute("SELECT body, media_type FROM entries WHERE key = ?", (key,)).fetchone()
+        return (bytes(row[0]), row[1]) if row else None
+
+    def set(self, key: str, entry: Entry, tags: Iterable[str]):
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.execute("DELETE FROM entry_tags WHERE key = ?", (key,))
+                self._conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", (key, entry[0], entry[1], time.time()))
+                self._conn.executemany("INSERT INTO entry_tags VALUES (?, ?)", [(tag, key) for tag in tags])
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._trim()
+
+    def _trim(self):
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM entries WHERE key NOT IN (SELECT key FROM entries ORDER BY stored DESC LIMIT ?)",
+                               (MAX_ENTRIES,))
+            self._conn.execute("DELETE FROM entry_tags WHERE key NOT IN (SELECT key FROM entries)")
+
+    def invalidate(self, tags: Iterable[str]):
+        tags = list(tags)
+        marks = ",".join("?" * len(tags))
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.execute(f"DELETE FROM entries WHERE key IN (SELECT key FROM entry_tags WHERE tag IN ({marks}))", tags)
+                self._conn.execute("DELETE FROM entry_tags WHERE key NOT IN (SELECT key FROM entries)")
+
+    def clear(self):
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.execute("DELETE FROM entries")
+                self._conn.execute("DELETE FROM entry_tags")
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES, directory: Optional[str] = CACHE_DIR):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[Entry, Tuple[str, ...]]]" = OrderedDict()
+        self._by_tag: Dict[str, Set[str]] = {}
+        self._bytes = 0
+        # Bumped by every invalidation of a tag: a response computed before a
+        # write committed must not be stored after it
+        self._generations: Dict[str, int] = {}
+        self._epoch = 0
+        self._disk = _DiskStore(directory) if directory else None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return item[0]
+        entry = self._disk.get(key) if self._disk else None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def generation(self, tags: Iterable[str]) -> Tuple:
+        with self._lock:
+            return (self._epoch,) + tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def set(self, key: str, entry: Entry, tags: Tuple[str, ...], generation: Tuple):
+        with self._lock:
+            if (self._epoch,) + tuple(self._generations.get(tag, 0) for tag in tags) != generation:
+                return
+            self._discard(key)
+            self._entries[key] = (entry, tags)
+            self._bytes += len(entry[0])
+            for tag in tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._discard(next(iter(self._entries)))
+            if self._disk:
+                self._disk.set(key, entry, tags)
+
+    def _discard(self, key: str):
+        item = self._entries.pop(key, None)
+        if item is None:
+            return
+        entry, tags = item
+        self._bytes -= len(entry[0])
+        for tag in tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    def invalidate(self, tags: Iterable[str]):
+        tags = set(tags)
+        if invalidation.ALL in tags:
+            self.clear()
+            return
+        if not tags:
+            return
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+                for key in list(self._by_tag.get(tag, ())):
+                    self._discard(key)
+            if self._disk:
+                self._disk.invalidate(tags)
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._by_tag.clear()
+            self._bytes = 0
+            if self._disk:
+                self._disk.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+
+response_cache = ResponseCache()
+invalidation.subscribe(response_cache.invalidate)
+
+
+# --- Endpoint decorator ---
+
+def by_user(user: models.User) -> str:
+    return user.id
+
+
+def by_role(user: models.User) -> str:
+    return user.role.value
+
+
+def _response(entry: Entry, status: str) -> Response:
+    return Response(content=entry[0], media_type=entry[1], headers={"X-Cache": status})
+
+
+def cached(response_model, depends: Iterable[str], scope: Optional[Callable[[models.User], str]] = None):
+    """
+    Cache a GET endpoint's serialized response.
+
+    depends: tables the response reads, or table partitions such as
+    "users:{class_id}" formatted with the endpoint's parameters.
+    scope: maps the caller (the endpoint's `current_user`) to the part of the
+    key that varies by user; omit it when every caller gets the same response.
+    """
+    adapter = TypeAdapter(response_model)
+    depends = tuple(depends)
+
+    def decorator(func):
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        def key_and_tags(kwargs) -> Tuple[str, Tuple[str, ...]]:
+            params = {k: v for k, v in kwargs.items() if k not in NOT_KEYED}
+            tags = set()
+            for dep in depends:
+                tag = dep.format(**params)
+                tags.add(tag)
+                if ":" in tag:
+                    # Writes whose partition is unknown (bulk statements) use table:*
+                    tags.add(tag.split(":", 1)[0] + ":*")
+            caller = scope(kwargs["current_user"]) if scope else ""
+            key = f"{name}|{caller}|{sorted(params.items())!r}"
+            return key, tuple(sorted(tags))
+
+        def serialize(result) -> Optional[Entry]:
+            if isinstance(result, Response):
+                return (bytes(result.body), result.media_type) if result.status_code == 200 else None
+            return adapter.dump_json(adapter.validate_python(result, from_attributes=True)), "application/json"
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(**kwargs):
+                if not ENABLED:
+                    return await func(**kwargs)
+                key, tags = key_and_tags(kwargs)
+                entry = response_cache.get(key)
+                if entry is not None:
+                    return _response(entry, "HIT")
+                generation = response_cache.generation(tags)
+                result = await func(**kwargs)
+                entry = serialize(result)
+                if entry is None:
+                    return result
+                response_cache.set(key, entry, tags, generation)
+                return _response(entry, "MISS")
+        else:
+            @functools.wraps(func)
+            def wrapper(**kwargs):
+                if not ENABLED:
+                    return func(**kwargs)
+                key, tags = key_and_tags(kwargs)
+                entry = response_cache.get(key)
+                if entry is not None:
+                    return _response(entry, "HIT")
+                generation = response_cache.generation(tags)
+                result = func(**kwargs)
+                entry = serialize(result)
+                if entry is None:
+                    return result
+                response_cache.set(key, entry, tags, generation)
+                return _response(entry, "MISS")
+        return wrapper
+    return decorator
@@ -0,0 +1,266 @@
+"""
+Set-based roster operations (bulk deletion, class moves, year-end promotion).
+
+Every function issues a handful of statements keyed on id lists and leaves the
+commit to the caller, so a whole operation is one transaction.
+"""
+import math
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+from sqlalchemy import delete, exists, func, insert, select, update
+from sqlalchemy.orm import Session
+from uuid import uuid4
+from . import gradebook, models, search
+from .school_structure import GRADES, grade_number, next_grade, split_class_name
+from .template_cache import template_cache
+
+# Keep IN (...) lists well below SQLite's bound-parameter limit
+CHUNK_SIZE = 500
+
+
+def _chunks(ids: List[str]) -> Iterator[List[str]]:
+    for i in range(0, len(ids), CHUNK_SIZE):
+        yield ids[i:i + CHUNK_SIZE]
+
+
+def class_ids_for_year(db: Session, year: str) -> List[str]:
+    """Ids of every class of one grade, e.g. year='6º Primaria' matches '6º Primaria A' and '6º Primaria B'."""
+    return [cid for cid, name in db.query(models.ClassGroup.id, models.ClassGroup.name)
+            if split_class_name(name)[0] == year]
+
+
+def student_ids_for_classes(db: Session, class_ids: Iterable[str]) -> List[str]:
+    class_ids = list(class_ids)
+    if not class_ids:
+        return []
+    return [sid for (sid,) in db.query(models.User.id).filter(
+        models.User.role == models.UserRole.STUDENT,
+        models.User.class_id.in_(class_ids)
+    )]
+
+
+def classes_of_students(db: Session, student_ids: List[str]) -> Set[str]:
+    class_ids = set()
+    for chunk in _chunks(student_ids):
+        class_ids.update(cid for (cid,) in db.execute(
+            select(models.User.class_id).where(models.User.id.in_(chunk), models.User.class_id.is_not(None)).distinct()
+        ))
+    return class_ids
+
+
+def delete_students(db: Session, student_ids: Iterable[str], purge_orphan_parents: bool = False) -> Dict[str, int]:
+    """
+    Delete students and every row that depends on them: grades, invoices and
+    parent links. With purge_orphan_parents, parents left without any child are
+    deleted too (with their invoices). Caller commits.
+    """
+    counts = {"students": 0, "grades": 0, "invoices": 0, "parent_links": 0, "parents": 0}
+    link = models.parent_student_association
+
+    # Only real students, never a teacher id passed by mistake
+    ids: List[str] = []
+    for chunk in _chunks(list(set(student_ids))):
+        ids.extend(sid for (sid,) in db.query(models.User.id).filter(
+            models.User.id.in_(chunk), models.User.role == models.UserRole.STUDENT
+        ))
+    if not ids:
+        return counts
+
+    class_ids = classes_of_students(db, ids)
+    parent_candidates = set()
+    for chunk in _chunks(ids):
+        parent_candidates.update(pid for (pid,) in db.execute(
+            select(link.c.parent_id).where(link.c.student_id.in_(chunk))
+        ))
+        search.remove_users(db, chunk)
+        counts["parent_links"] += db.execute(delete(link).where(link.c.student_id.in_(chunk))).rowcount
+        counts["grades"] += db.execute(delete(models.Grade).where(models.Grade.student_id.in_(chunk))).rowcount
+        counts["invoices"] += db.execute(delete(models.Invoice).where(models.Invoice.student_id.in_(chunk))).rowcount
+        counts["students"] += db.execute(delete(models.User).where(models.User.id.in_(chunk))).rowcount
+
+    if purge_orphan_parents and parent_candidates:
+        # NOT EXISTS, not NOT IN: a single NULL parent_id would make NOT IN match nothing
+        still_linked = exists().where(link.c.parent_id == models.User.id)
+        for chunk in _chunks(list(parent_candidates)):
+            orphans = [pid for (pid,) in db.query(models.User.id).filter(
+                models.User.id.in_(chunk),
+                models.User.role == models.UserRole.PARENT,
+                ~still_linked
+            )]
+            if not orphans:
+                continue
+            search.remove_users(db, orphans)
+            counts["invoices"] += db.execute(delete(models.Invoice).where(models.Invoice.parent_id.in_(orphans))).rowcount
+            counts["parents"] += db.execute(delete(models.User).where(models.User.id.in_(orphans))).rowcount
+
+    gradebook.refresh_aggregates(db, class_ids)
+    # Bulk statements bypass the identity map
+    db.expire_all()
+    return counts
+
+
+def detach_class(db: Session, class_id: str) -> Dict[str, int]:
+    """
+    Clear everything that points at a class before it is deleted: students are
+    unassigned, class announcements, subjects and timetable slots are removed.
+    Caller deletes the class and commits.
+    """
+    student_ids = student_ids_for_classes(db, [class_id])
+    counts = {
+        "students_unassigned": db.execute(
+            update(models.User).where(models.User.class_id == class_id).values(class_id=None)
+        ).rowcount,
+        "announcements": db.execute(
+            delete(models.Announcement).where(models.Announcement.target_class_id == class_id)
+        ).rowcount,
+        "schedule_slots": db.execute(
+            delete(models.ScheduleSlot).where(models.ScheduleSlot.class_id == class_id)
+        ).rowcount,
+        "subjects": db.execute(
+            delete(models.ClassSubject).where(models.ClassSubject.class_id == class_id)
+        ).rowcount,
+    }
+    for chunk in _chunks(student_ids):
+        search.index_users(db, chunk)
+    gradebook.refresh_aggregates(db, [class_id])
+    db.expire_all()
+    return counts
+
+
+def move_students(db: Session, target_class_id: str, student_ids: Iterable[str] = None, from_class_id: str = None) -> int:
+    """Assign a list of students, or every student of from_class_id, to target_class_id. Caller commits."""
+    if from_class_id is not None:
+        ids = student_ids_for_classes(db, [from_class_id])
+        class_ids = {from_class_id}
+        moved = db.execute(
+            update(models.User)
+            .where(models.User.class_id == from_class_id, models.User.role == models.UserRole.STUDENT)
+            .values(class_id=target_class_id)
+        ).rowcount
+    else:
+        ids = list(set(student_ids or []))
+        class_ids = classes_of_students(db, ids)
+        moved = 0
+        for chunk in _chunks(ids):
+            moved += db.execute(
+                update(models.User)
+                .where(models.User.id.in_(chunk), models.User.role == models.UserRole.STUDENT)
+                .values(class_id=target_class_id)
+            ).rowcount
+    for chunk in _chunks(ids):
+        search.index_users(db, chunk)
+    # Grades follow their students
+    gradebook.refresh_aggregates(db, class_ids | {target_class_id})
+    db.expire_all()
+    return moved
+
+
+def _count_in(db: Session, column, ids: List[str]) -> int:
+    return sum(db.scalar(select(func.count()).where(column.in_(chunk))) for chunk in _chunks(ids))
+
+
+def promote_classes(db: Session, dry_run: bool = False, delete_graduates: bool = False) -> Dict:
+    """
+    Advance every class one grade: '3º Primaria B' becomes '4º Primaria B' and
+    keeps its students and tutor. Final-year classes graduate: their students
+    are unassigned (or deleted with delete_graduates) and the empty class is
+    recycled as the entry year, e.g. '4º ESO A' -> 'Infantil 3 años A'.
+    Every promoted class gets the curriculum of its new year: its subjects and
+    timetable are replaced by the subject templates of that year (subjects
+    with the same name keep their teacher). A class whose new year has no
+    templates keeps its subjects and timetable and is reported in
+    kept_curriculum. Recycled classes also lose their announcements. Classes
+    whose name does not follow the school structure are skipped. Caller
+    commits.
+    """
+    entry_grade, entry_level = GRADES[0]
+    promotions = []
+    class_updates = []
+    graduating_class_ids = []
+    skipped = []
+    # class id -> (level, year within the level) after promotion
+    new_years: Dict[str, Tuple[models.EducationLevel, int]] = {}
+
+    for class_id, name in db.query(models.ClassGroup.id, models.ClassGroup.name).order_by(models.ClassGroup.id):
+        grade, group = split_class_name(name)
+        if grade is None:
+            skipped.append(class_id)
+            continue
+        following = next_grade(grade)
+        if following is None:
+            graduating_class_ids.append(class_id)
+            new_grade, new_level = entry_grade, entry_level
+        else:
+            new_grade, new_level = following
+        new_name = f"{new_grade} {group}".strip()
+        promotions.append({"class_id": class_id, "from_name": name, "to_name": new_name, "graduating": following is None})
+        class_updates.append({"id": class_id, "name": new_name, "level": new_level})
+        new_years[class_id] = (new_level, grade_number(new_grade))
+
+    graduate_ids = student_ids_for_classes(db, graduating_class_ids)
+    templates = {
+        class_id: template_cache.get(db, level=level, grade=number)
+        for class_id, (level, number) in new_years.items()
+    }
+    # Only classes whose new year has a curriculum lose their current one
+    promoted_ids = [class_id for class_id in new_years if templates[class_id]]
+    kept_curriculum = [class_id for class_id in new_years if not templates[class_id]]
+    # Teachers of the current subjects, by class and subject name
+    teachers: Dict[str, Dict[str, str]] = {}
+    subjects_removed = 0
+    for chunk in _chunks(promoted_ids):
+        for class_id, subject, teacher_id in db.execute(
+            select(models.ClassSubject.class_id, models.ClassSubject.name, models.ClassSubject.teacher_id)
+            .where(models.ClassSubject.class_id.in_(chunk))
+        ):
+            subjects_removed += 1
+            if teacher_id:
+                teachers.setdefault(class_id, {})[subject] = teacher_id
+    new_subjects = [
+        {
+            "id": f"subj_{uuid4().hex[:8]}",
+            "class_id": class_id,
+            "name": template.name,
+            # Templates allow fractional hours; the timetable places whole slots
+            "hours_weekly": math.ceil(template.default_hours or 0),
+            "teacher_id": teachers.get(class_id, {}).get(template.name),
+        }
+        for class_id in promoted_ids
+        for template in templates[class_id]
+    ]
+    result = {
+        "promoted": promotions,
+        "graduated_students": len(graduate_ids),
+        "skipped": skipped,
+        "deleted": None,
+        "subjects_removed": subjects_removed,
+        "subjects_created": len(new_subjects),
+        "schedule_slots_removed": _count_in(db, models.ScheduleSlot.class_id, promoted_ids),
+        "announcements_removed": _count_in(db, models.Announcement.target_class_id, graduating_class_ids),
+        "kept_curriculum": kept_curriculum,
+    }
+    if dry_run:
+        return result
+
+    if class_updates:
+        # Bulk UPDATE by primary key: one executemany for every class
+        db.execute(update(models.ClassGroup), class_updates)
+    # Last year's curriculum and timetable go; slots first, they point at the subjects
+    for chunk in _chunks(promoted_ids):
+        db.execute(delete(models.ScheduleSlot).where(models.ScheduleSlot.class_id.in_(chunk)))
+        db.execute(delete(models.ClassSubject).where(models.ClassSubject.class_id.in_(chunk)))
+    if new_subjects:
+        db.execute(insert(models.ClassSubject), new_subjects)
+    for chunk in _chunks(graduating_class_ids):
+        # Addressed to the graduates, not to next year's entry class
+        db.execute(delete(models.Announcement).where(models.Announcement.target_class_id.in_(chunk)))
+    if delete_graduates:
+        result["deleted"] = delete_students(db, graduate_ids, purge_orphan_parents=True)
+    elif graduate_ids:
+        db.execute(
+            update(models.User).where(models.User.class_id.in_(graduating_class_ids)).values(class_id=None)
+        )
+        for chunk in _chunks(graduate_ids):
+            search.index_users(db, chunk)
+        gradebook.refresh_aggregates(db, graduating_class_ids)
+    db.expire_all()
+    return result
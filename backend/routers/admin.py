@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from typing import List, Optional
+from .. import models, schemas, profiling
+from ..slow_queries import slow_query_log
+from .auth import get_current_user
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+def require_principal(current_user: models.User = Depends(get_current_user)):
+    if current_user.role != models.UserRole.PRINCIPAL:
+        raise HTTPException(status_code=403, detail="Only the principal can access diagnostics")
+    return current_user
+
+@router.get("/slow-queries", response_model=schemas.SlowQueryLogResponse)
+def read_slow_queries(limit: Optional[int] = None, current_user: models.User = Depends(require_principal)):
+    """Most recent slow statements first, with their query plans (enable with SLOW_QUERY_MS)"""
+    if slow_query_log is None:
+        return {"enabled": False, "samples": []}
+    return {
+        "enabled": True,
+        "threshold_ms": slow_query_log.threshold * 1000,
+        "samples": slow_query_log.recent(limit)
+    }
+
+@router.delete("/slow-queries")
+def clear_slow_queries(current_user: models.User = Depends(require_principal)):
+    if slow_query_log is not None:
+        slow_query_log.clear()
+    return {"ok": True}
+
+@router.get("/profiles", response_model=List[schemas.ProfileInfo])
+def read_profiles(current_user: models.User = Depends(require_principal)):
+    """Stored request profiles of this worker, newest first"""
+    return profiling.list_profiles()
+
+@router.get("/profiles/{profile_id}")
+def download_profile(profile_id: str, current_user: models.User = Depends(require_principal)):
+    """Collapsed stacks ("frame;frame count" lines) for flamegraph.pl or speedscope"""
+    path = profiling.profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.collapsed")
@@ -0,0 +1,68 @@
+import base64
+import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import and_, or_, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Tuple
+from .. import models, schemas
+from ..async_database import get_async_db
+from ..events import class_ids_for
+from .auth import get_current_user_async
+
+router = APIRouter(prefix="/announcements", tags=["Announcements"])
+
+Announcement = models.Announcement
+NEWEST_FIRST = (Announcement.date.desc(), Announcement.id.desc())
+
+
+def _encode_cursor(announcement: models.Announcement) -> str:
+    raw = f"{announcement.date.isoformat()}|{announcement.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime.date, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        day, announcement_id = raw.split("|", 1)
+        return datetime.date.fromisoformat(day), announcement_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _older_than(cursor: Tuple[datetime.date, str]):
+    day, announcement_id = cursor
+    return or_(Announcement.date < day, and_(Announcement.date == day, Announcement.id < announcement_id))
+
+
+@router.get("/", response_model=schemas.AnnouncementFeed)
+async def read_feed(
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
+):
+    """School-wide announcements plus those of the caller's classes (a parent's: their children's), newest first. Undated ones are left out"""
+    position = _decode_cursor(cursor) if cursor else None
+    class_ids = await class_ids_for(db, current_user)
+
+    if class_ids is None:
+        # Principals see every announcement: one scan of the date index
+        query = select(Announcement).where(Announcement.date.is_not(None))
+        if position:
+            query = query.where(_older_than(position))
+    else:
+        # One short range scan of (target_class_id, date) per target, merged:
+        # never reads more than limit + 1 rows from each
+        branches = []
+        for target in (Announcement.target_class_id.is_(None), *(Announcement.target_class_id == c for c in sorted(class_ids))):
+            branch = select(Announcement.id).where(target, Announcement.date.is_not(None))
+            if position:
+                branch = branch.where(_older_than(position))
+            branch = branch.order_by(*NEWEST_FIRST).limit(limit + 1).subquery()
+            branches.append(select(branch.c.id))
+        query = select(Announcement).where(Announcement.id.in_(union_all(*branches)))
+
+    rows = (await db.scalars(query.order_by(*NEWEST_FIRST).limit(limit + 1))).all()
+    items = rows[:limit]
+    next_cursor = _encode_cursor(items[-1]) if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
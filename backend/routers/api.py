@@ -1,18 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
-from .. import models, schemas, database
-from .auth import get_current_user
+from sqlalchemy import extract, func
+from typing import List, Optional
+import calendar
+import datetime
+from .. import models, schemas, projections
+from ..database import get_db
+from ..response_cache import cached
+from .auth import get_current_user, USER_RESPONSE_OPTIONS
 
 router = APIRouter(tags=["Dashboard"])
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def _in_range(query, column, date_from: Optional[datetime.date], date_to: Optional[datetime.date]):
+    """Inclusive date range filter (an index range scan on the date columns). Rows without a date only match an open range"""
+    if date_from is not None:
+        query = query.filter(column >= date_from)
+    if date_to is not None:
+        query = query.filter(column <= date_to)
+    return query
 
 @router.get("/dashboard/summary", response_model=schemas.DashboardSummary)
 def get_dashboard_summary(
@@ -35,6 +41,9 @@ def get_dashboard_summary(
 
 @router.get("/bootstrap", response_model=schemas.BootstrapData)
 def get_bootstrap_data(
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+    fields: Optional[List[str]] = Depends(projections.sparse_fields),
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -42,8 +51,13 @@ def get_bootstrap_data(
     Returns the full initial state for the application.
     In a real large-scale app, we would fetch this granularly, 
     but for this specific dashboard architecture, we sync the state on load.
+    date_from/date_to restrict grades, invoices (by due date) and announcements;
+    fields= returns only those user columns instead of full users.
     """
-    users = db.query(models.User).all()
+    if fields:
+        users = projections.as_dicts(fields, db.execute(projections.user_projection(fields)))
+    else:
+        users = db.query(models.User).options(*USER_RESPONSE_OPTIONS).all()
     
     # Filter Classes for Teachers
     class_query = db.query(models.ClassGroup)
@@ -54,49 +68,51 @@ def get_bootstrap_data(
                          (models.ClassSubject.teacher_id == current_user.id)
                      ).distinct()
     classes = class_query.all()
-    grades = db.query(models.Grade).all()
-    invoices = db.query(models.Invoice).all()
-    announcements = db.query(models.Announcement).all()
+    grades = _in_range(db.query(models.Grade), models.Grade.date, date_from, date_to).all()
+    invoices = _in_range(db.query(models.Invoice), models.Invoice.due_date, date_from, date_to).all()
+    announcements = _in_range(db.query(models.Announcement), models.Announcement.date, date_from, date_to).all()
     
-    return {
+    data = {
         "users": users,
         "classes": classes,
         "grades": grades,
         "invoices": invoices,
         "announcements": announcements
     }
+    if fields:
+        # Returned directly: response_model would reject the partial users
+        return JSONResponse(schemas.SparseBootstrapData(**data).model_dump(mode="json"))
+    return data
 
 @router.get("/dashboard/charts", response_model=schemas.DashboardCharts)
+@cached(schemas.DashboardCharts, depends=["invoices", "grades"])
 def get_dashboard_charts(
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Mock aggregation for charts as complex SQL grouping might be overkill for this initial step
-    # but we can return data based on what's in DB or static structure for now as requested "mock data logic"
-    
-    # Revenue by Month (Mock distribution based on invoices)
+    """Collected revenue per due month and average grade per subject, optionally for a date range (e.g. a term)"""
+    year = extract("year", models.Invoice.due_date)
+    month = extract("month", models.Invoice.due_date)
+    revenue_query = db.query(year, month, func.sum(models.Invoice.amount))\
+                      .filter(models.Invoice.status == models.InvoiceStatus.PAID, models.Invoice.due_date.is_not(None))
+    revenue_query = _in_range(revenue_query, models.Invoice.due_date, date_from, date_to)
     revenue_data = [
-        {"name": "Jan", "value": 4000},
-        {"name": "Feb", "value": 3000},
-        {"name": "Mar", "value": 2000},
-        {"name": "Apr", "value": 2780},
-        {"name": "May", "value": 1890},
-        {"name": "Jun", "value": 2390},
-        {"name": "Jul", "value": 3490},
-    ] # Simplified for demo
-    
+        {"name": f"{calendar.month_abbr[int(m)]} {int(y)}", "value": round(total or 0, 2)}
+        for y, m, total in revenue_query.group_by(year, month).order_by(year, month)
+    ]
+
     # Student Performance (Average Grades by Subject)
-    # This we can actually query!
     subjects = ["Matemáticas", "Lengua", "Historia", "Ciencias", "Inglés"]
-    performance_data = []
-    
-    for sub in subjects:
-        avg = db.query(func.avg(models.Grade.score)).filter(models.Grade.subject == sub).scalar()
-        if avg:
-            performance_data.append({"name": sub, "value": round(avg, 1)})
-        else:
-            performance_data.append({"name": sub, "value": 0})
-            
+    grade_query = db.query(models.Grade.subject, func.avg(models.Grade.score))\
+                    .filter(models.Grade.subject.in_(subjects))
+    averages = dict(_in_range(grade_query, models.Grade.date, date_from, date_to).group_by(models.Grade.subject).all())
+    performance_data = [
+        {"name": sub, "value": round(averages[sub], 1) if averages.get(sub) else 0}
+        for sub in subjects
+    ]
+
     return {
         "revenue_by_month": revenue_data,
         "student_performance": performance_data
@@ -1,39 +1,55 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional
 from datetime import timedelta
 from jose import JWTError, jwt
-from .. import models, schemas, auth_utils, database
+from .. import models, schemas, auth_utils, search, projections
+from ..database import get_db
+from ..async_database import get_async_db
 
 router = APIRouter(tags=["Authentication"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# UserResponse nests children (and their children): async sessions can't lazy load them
+USER_RESPONSE_OPTIONS = (selectinload(models.User.children).selectinload(models.User.children),)
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _token_data(token: str, scope: Optional[str] = None) -> schemas.TokenData:
+    """Validate a token. Access tokens carry no scope; narrower tokens (e.g. event stream tickets) name theirs."""
     try:
         payload = jwt.decode(token, auth_utils.SECRET_KEY, algorithms=[auth_utils.ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = schemas.TokenData(username=username)
+        if username is None or payload.get("scope") != scope:
+            raise _credentials_exception()
+        return schemas.TokenData(username=username)
     except JWTError:
-        raise credentials_exception
-    
+        raise _credentials_exception()
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    """Current user, loaded through the request's sync session (for sync endpoints)."""
+    token_data = _token_data(token)
     user = db.query(models.User).filter(models.User.email == token_data.username).first()
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    return user
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    """Current user, loaded through the request's AsyncSession (for async endpoints)."""
+    token_data = _token_data(token)
+    user = await db.scalar(select(models.User).where(models.User.email == token_data.username))
+    if user is None:
+        raise _credentials_exception()
     return user
 
 @router.post("/register", response_model=schemas.UserResponse)
@@ -58,14 +74,16 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_user)
+    search.index_users(db, [db_user.id])
     db.commit()
     db.refresh(db_user)
     return db_user
 
 @router.post("/token", response_model=schemas.Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not user or not auth_utils.verify_password(form_data.password, user.hashed_password):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(models.User).where(models.User.email == form_data.username))
+    # Argon2 verification is CPU bound: keep it off the event loop
+    if not user or not await run_in_threadpool(auth_utils.verify_password, form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -78,10 +96,18 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/users/me", response_model=schemas.UserResponse)
-async def read_users_me(current_user: models.User = Depends(get_current_user)):
-    return current_user
+async def read_users_me(db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
+    # Same identity map as get_current_user_async: this only loads the children
+    return await db.scalar(
+        select(models.User).where(models.User.id == current_user.id).options(*USER_RESPONSE_OPTIONS)
+    )
 
 @router.get("/teachers", response_model=List[schemas.UserResponse])
-async def read_all_teachers(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    teachers = db.query(models.User).filter(models.User.role == models.UserRole.TEACHER).all()
-    return teachers
+async def read_all_teachers(fields: Optional[List[str]] = Depends(projections.sparse_fields), db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
+    if fields:
+        rows = await db.execute(projections.user_projection(fields, models.User.role == models.UserRole.TEACHER))
+        return JSONResponse(projections.as_dicts(fields, rows))
+    result = await db.scalars(
+        select(models.User).where(models.User.role == models.UserRole.TEACHER).options(*USER_RESPONSE_OPTIONS)
+    )
+    return result.all()
@@ -1,10 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import List, Optional
 import uuid
 
-from .. import models, schemas, database
-from .auth import get_db, get_current_user
+from .. import models, schemas, roster
+from ..response_cache import cached
+from ..async_database import get_async_db
+from ..events import class_ids_for
+from .auth import get_current_user_async
 
 router = APIRouter(
     prefix="/classes",
@@ -12,26 +17,43 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# ClassGroupResponse includes subjects; async sessions can't lazy load them
+CLASS_RESPONSE_OPTIONS = (selectinload(models.ClassGroup.subjects),)
+
+async def _get_class(db: AsyncSession, class_id: str) -> models.ClassGroup:
+    db_class = await db.get(models.ClassGroup, class_id, options=CLASS_RESPONSE_OPTIONS)
+    if not db_class:
+        raise HTTPException(status_code=404, detail="Class not found")
+    return db_class
+
+async def _check_teacher(db: AsyncSession, teacher_id: str):
+    teacher = await db.scalar(select(models.User.id).where(models.User.id == teacher_id, models.User.role == models.UserRole.TEACHER))
+    if not teacher:
+        raise HTTPException(status_code=400, detail="Teacher not found")
+
+def _classes_scope(user: models.User) -> str:
+    # Teachers only see their own classes; everyone else sees them all
+    return user.id if user.role == models.UserRole.TEACHER else "all"
+
 @router.get("/", response_model=List[schemas.ClassGroupResponse])
-async def read_classes(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    query = db.query(models.ClassGroup)
+@cached(List[schemas.ClassGroupResponse], depends=["class_groups", "class_subjects"], scope=_classes_scope)
+async def read_classes(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
+    query = select(models.ClassGroup).options(*CLASS_RESPONSE_OPTIONS)
     if current_user.role == models.UserRole.TEACHER:
         # Show classes where I am Tutor OR I teach a subject
         query = query.outerjoin(models.ClassSubject, models.ClassGroup.id == models.ClassSubject.class_id)\
-                     .filter(
-                         (models.ClassGroup.teacher_id == current_user.id) | 
+                     .where(
+                         (models.ClassGroup.teacher_id == current_user.id) |
                          (models.ClassSubject.teacher_id == current_user.id)
                      ).distinct()
-    
-    classes = query.offset(skip).limit(limit).all()
-    return classes
+
+    classes = await db.scalars(query.offset(skip).limit(limit))
+    return classes.all()
 
 @router.post("/", response_model=schemas.ClassGroupResponse)
-async def create_class(class_group: schemas.ClassGroupCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+async def create_class(class_group: schemas.ClassGroupCreate, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
     # Check if teacher exists
-    teacher = db.query(models.User).filter(models.User.id == class_group.teacher_id, models.User.role == models.UserRole.TEACHER).first()
-    if not teacher:
-        raise HTTPException(status_code=400, detail="Teacher not found")
+    await _check_teacher(db, class_group.teacher_id)
 
     new_id = f"class_{uuid.uuid4().hex[:8]}"
     db_class = models.ClassGroup(
@@ -41,61 +63,63 @@ async def create_class(class_group: schemas.ClassGroupCreate, db: Session = Depe
         teacher_id=class_group.teacher_id
     )
     db.add(db_class)
-    db.commit()
-    db.refresh(db_class)
+    await db.commit()
+    await db.refresh(db_class, ["subjects"])
     return db_class
 
+@router.post("/promote", response_model=schemas.PromotionResult)
+async def promote_classes(dry_run: bool = False, delete_graduates: bool = False, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
+    """Year-end promotion: every class advances one grade in a single transaction"""
+    if current_user.role != models.UserRole.PRINCIPAL:
+        raise HTTPException(status_code=403, detail="Only the principal can run the year-end promotion")
+    result = await db.run_sync(roster.promote_classes, dry_run=dry_run, delete_graduates=delete_graduates)
+    if not dry_run:
+        await db.commit()
+    return result
+
 @router.put("/{class_id}", response_model=schemas.ClassGroupResponse)
-async def update_class(class_id: str, class_update: schemas.ClassGroupUpdate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    db_class = db.query(models.ClassGroup).filter(models.ClassGroup.id == class_id).first()
-    if not db_class:
-        raise HTTPException(status_code=404, detail="Class not found")
-    
+async def update_class(class_id: str, class_update: schemas.ClassGroupUpdate, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
+    db_class = await _get_class(db, class_id)
+
     if class_update.name is not None:
         db_class.name = class_update.name
     if class_update.level is not None:
         db_class.level = class_update.level
     if class_update.teacher_id is not None:
         # Verify teacher
-        teacher = db.query(models.User).filter(models.User.id == class_update.teacher_id, models.User.role == models.UserRole.TEACHER).first()
-        if not teacher:
-            raise HTTPException(status_code=400, detail="Teacher not found")
+        await _check_teacher(db, class_update.teacher_id)
         db_class.teacher_id = class_update.teacher_id
-        
-    db.commit()
-    db.refresh(db_class)
+
+    await db.commit()
     return db_class
 
+def _delete_class(db, class_id: str):
+    # Students are unassigned (not deleted); class announcements, subjects and slots are removed
+    roster.detach_class(db, class_id)
+    db.delete(db.get(models.ClassGroup, class_id))
+
 @router.delete("/{class_id}")
-async def delete_class(class_id: str, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    db_class = db.query(models.ClassGroup).filter(models.ClassGroup.id == class_id).first()
-    if not db_class:
+async def delete_class(class_id: str, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
+    if await db.get(models.ClassGroup, class_id) is None:
         raise HTTPException(status_code=404, detail="Class not found")
-    
-    # Optional: Check for dependency (students assigned to this class)
-    # For now, we allow deletion, but in production we might want to block or cascade.
-    # students = db.query(models.User).filter(models.User.class_id == class_id).all()
-    # if students:
-    #     raise HTTPException(status_code=400, detail="Cannot delete class with students assigned")
-        
-    db.delete(db_class)
-    db.commit()
+
+    await db.run_sync(_delete_class, class_id)
+    await db.commit()
     return {"ok": True}
 
 # --- Subjects Management ---
 
 @router.get("/{class_id}/subjects", response_model=List[schemas.ClassSubjectResponse])
-async def read_class_subjects(class_id: str, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    subjects = db.query(models.ClassSubject).filter(models.ClassSubject.class_id == class_id).all()
-    return subjects
+async def read_class_subjects(class_id: str, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
+    subjects = await db.scalars(select(models.ClassSubject).where(models.ClassSubject.class_id == class_id))
+    return subjects.all()
 
 @router.post("/{class_id}/subjects", response_model=schemas.ClassSubjectResponse)
-async def create_class_subject(class_id: str, subject: schemas.ClassSubjectCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+async def create_class_subject(class_id: str, subject: schemas.ClassSubjectCreate, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
     # Verify class exists
-    db_class = db.query(models.ClassGroup).filter(models.ClassGroup.id == class_id).first()
-    if not db_class:
+    if await db.get(models.ClassGroup, class_id) is None:
         raise HTTPException(status_code=404, detail="Class not found")
-        
+
     new_id = f"subj_{uuid.uuid4().hex[:8]}"
     db_subject = models.ClassSubject(
         id=new_id,
@@ -105,30 +129,79 @@ async def create_class_subject(class_id: str, subject: schemas.ClassSubjectCreat
         teacher_id=subject.teacher_id
     )
     db.add(db_subject)
-    db.commit()
-    db.refresh(db_subject)
+    await db.commit()
     return db_subject
 
 @router.put("/subjects/{subject_id}", response_model=schemas.ClassSubjectResponse)
-async def update_class_subject(subject_id: str, subject_update: schemas.ClassSubjectCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    db_subject = db.query(models.ClassSubject).filter(models.ClassSubject.id == subject_id).first()
+async def update_class_subject(subject_id: str, subject_update: schemas.ClassSubjectCreate, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
+    db_subject = await db.get(models.ClassSubject, subject_id)
     if not db_subject:
         raise HTTPException(status_code=404, detail="Subject not found")
-    
+
     db_subject.name = subject_update.name
     db_subject.hours_weekly = subject_update.hours_weekly
     db_subject.teacher_id = subject_update.teacher_id
-    
-    db.commit()
-    db.refresh(db_subject)
+
+    await db.commit()
     return db_subject
 
 @router.delete("/subjects/{subject_id}")
-async def delete_class_subject(subject_id: str, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    db_subject = db.query(models.ClassSubject).filter(models.ClassSubject.id == subject_id).first()
+async def delete_class_subject(subject_id: str, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
+    db_subject = await db.get(models.ClassSubject, subject_id)
     if not db_subject:
         raise HTTPException(status_code=404, detail="Subject not found")
-    
-    db.delete(db_subject)
-    db.commit()
+
+    await db.delete(db_subject)
+    await db.commit()
     return {"ok": True}
+
+# --- Gradebook ---
+
+async def _gradebook_reader(class_id: str, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
+    # A dependency, so it runs before the cache lookup
+    if await db.scalar(select(models.ClassGroup.id).where(models.ClassGroup.id == class_id)) is None:
+        raise HTTPException(status_code=404, detail="Class not found")
+    allowed = await class_ids_for(db, current_user)
+    if current_user.role not in (models.UserRole.PRINCIPAL, models.UserRole.TEACHER) or (allowed is not None and class_id not in allowed):
+        raise HTTPException(status_code=403, detail="Only the principal and the class's teachers can see its gradebook")
+    return current_user
+
+def _mean(values: List[float]) -> Optional[float]:
+    return round(sum(values) / len(values), 2) if values else None
+
+@router.get("/{class_id}/gradebook", response_model=schemas.ClassGradebook)
+@cached(schemas.ClassGradebook, depends=["grades", "users:{class_id}"])
+async def read_gradebook(class_id: str, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(_gradebook_reader)):
+    """Students x subjects matrix of average scores, as columnar arrays (scores are row-major, null where ungraded)"""
+    # One grouped query; the outer join keeps students without grades
+    rows = await db.execute(
+        select(models.User.id, models.Grade.subject, func.avg(models.Grade.score))
+        .select_from(models.User)
+        .outerjoin(models.Grade, models.Grade.student_id == models.User.id)
+        .where(models.User.class_id == class_id, models.User.role == models.UserRole.STUDENT)
+        .group_by(models.User.id, models.User.name, models.Grade.subject)
+        .order_by(models.User.name, models.User.id)
+    )
+    cells = {}
+    student_ids = []
+    subjects = set()
+    for student_id, subject, score in rows:
+        if not student_ids or student_ids[-1] != student_id:
+            student_ids.append(student_id)
+        if subject is not None:
+            subjects.add(subject)
+            cells[(student_id, subject)] = round(score, 2) if score is not None else None
+    subjects = sorted(subjects)
+
+    scores = [cells.get((s, subject)) for s in student_ids for subject in subjects]
+    width = len(subjects)
+    row_averages = [_mean([v for v in scores[i * width:(i + 1) * width] if v is not None]) for i in range(len(student_ids))]
+    column_averages = [_mean([v for v in scores[j::width] if v is not None]) for j in range(width)]
+    return {
+        "class_id": class_id,
+        "student_ids": student_ids,
+        "subjects": subjects,
+        "scores": scores,
+        "row_averages": row_averages,
+        "column_averages": column_averages,
+    }
@@ -1,8 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from .. import models, schemas
 from ..database import get_db
+from ..response_cache import cached
+from ..template_cache import template_cache, bump_version
+from ..curriculum_loader import upsert_templates, load_curriculum
 from uuid import uuid4
 
 router = APIRouter(
@@ -11,13 +14,11 @@ router = APIRouter(
 )
 
 @router.get("/templates", response_model=List[schemas.SubjectTemplateResponse])
-def get_templates(level: models.EducationLevel = None, db: Session = Depends(get_db)):
+@cached(List[schemas.SubjectTemplateResponse], depends=["subject_templates"])
+def get_templates(level: models.EducationLevel = None, grade: Optional[int] = None, db: Session = Depends(get_db)):
     try:
-        query = db.query(models.SubjectTemplate)
-        if level:
-            query = query.filter(models.SubjectTemplate.education_level == level)
-        results = query.all()
-        return results
+        # Served from the in-process cache, reloaded only when the version stamp changes
+        return template_cache.get(db, level=level, grade=grade)
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -33,10 +34,28 @@ def create_template(template: schemas.SubjectTemplateCreate, db: Session = Depen
         grade=template.grade # Saved to DB
     )
     db.add(db_template)
+    bump_version(db)
     db.commit()
     db.refresh(db_template)
     return db_template
 
+@router.post("/templates/bulk", response_model=schemas.SubjectTemplateBulkResult)
+def bulk_upsert_templates(templates: List[schemas.SubjectTemplateCreate], db: Session = Depends(get_db)):
+    """Create or update many templates in one transaction, keyed on (name, level, grade)."""
+    created, updated, rows = upsert_templates(db, templates)
+    db.commit()
+    return {"created": created, "updated": updated, "templates": rows}
+
+@router.post("/templates/official", response_model=schemas.SubjectTemplateBulkResult)
+def load_official_curriculum(curriculum: schemas.OfficialCurriculum, db: Session = Depends(get_db)):
+    """Load a regional curriculum in the CURRICULUM_DATA JSON shape."""
+    try:
+        created, updated, rows = load_curriculum(db, curriculum)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    db.commit()
+    return {"created": created, "updated": updated, "templates": rows}
+
 @router.delete("/templates/{template_id}")
 def delete_template(template_id: str, db: Session = Depends(get_db)):
     db_template = db.query(models.SubjectTemplate).filter(models.SubjectTemplate.id == template_id).first()
@@ -44,6 +63,7 @@ def delete_template(template_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Template not found")
     
     db.delete(db_template)
+    bump_version(db)
     db.commit()
     return {"message": "Template deleted successfully"}
 @router.post("/apply-standard/{class_id}")
@@ -55,10 +75,7 @@ def apply_standard(class_id: str, grade: int, db: Session = Depends(get_db)):
         
     # 2. Get Templates
     # Assuming class level matches template level
-    templates = db.query(models.SubjectTemplate).filter(
-        models.SubjectTemplate.education_level == db_class.level,
-        models.SubjectTemplate.grade == grade
-    ).all()
+    templates = template_cache.get(db, level=db_class.level, grade=grade)
     
     if not templates:
         raise HTTPException(status_code=404, detail=f"No curriculum found for grade {grade} in {db_class.level.value}")
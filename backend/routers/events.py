@@ -0,0 +1,123 @@
+import asyncio
+import json
+import os
+from datetime import timedelta
+from typing import Dict, Optional
+from fastapi import APIRouter, Depends, Header, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+from .. import auth_utils, events, models, schemas
+from ..async_database import AsyncSessionLocal
+from .auth import _credentials_exception, _token_data, get_current_user_async
+
+router = APIRouter(tags=["Events"])
+
+# Replay after a reconnect is capped: a client further behind gets "resync"
+REPLAY_LIMIT = 500
+
+# Query strings end up in access logs (uvicorn's, proxies'): the URL only ever
+# carries a ticket that expires quickly and can't be used as an access token
+TICKET_SCOPE = "events"
+TICKET_TTL = int(os.getenv("EVENTS_TICKET_TTL_S", 60))
+
+_change_log = models.ChangeLog.__table__
+
+
+def _format(change_id: Optional[int], event: Dict) -> str:
+    payload = {k: v for k, v in event.items() if k != "audience"}
+    lines = [f"id: {change_id}"] if change_id is not None else []
+    lines.append(f"event: {event['type']}")
+    lines.append(f"data: {json.dumps(payload, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def _replay(db, keys, last_event_id: int):
+    """Events committed after last_event_id, still in the change log."""
+    oldest = await db.scalar(select(func.min(_change_log.c.id)))
+    if oldest is None or oldest > last_event_id + 1:
+        # Pruned (or reset) since the client was last connected
+        return [(None, events.RESYNC)]
+    rows = (await db.execute(
+        select(_change_log.c.id, _change_log.c.events)
+        .where(_change_log.c.id > last_event_id, _change_log.c.events.is_not(None))
+        .order_by(_change_log.c.id)
+        .limit(REPLAY_LIMIT + 1)
+    )).all()
+    if len(rows) > REPLAY_LIMIT:
+        return [(None, events.RESYNC)]
+    return [(row_id, event) for row_id, row_events in rows for event in json.loads(row_events) if events.visible(event, keys)]
+
+
+@router.post("/events/ticket", response_model=schemas.EventTicket)
+async def create_ticket(current_user: models.User = Depends(get_current_user_async)):
+    """Short-lived credential for opening /events from EventSource, which can't send an Authorization header"""
+    ticket = auth_utils.create_access_token(
+        data={"sub": current_user.email, "scope": TICKET_SCOPE}, expires_delta=timedelta(seconds=TICKET_TTL)
+    )
+    return {"ticket": ticket, "expires_in": TICKET_TTL}
+
+
+@router.get("/events")
+async def stream_events(
+    ticket: Optional[str] = None,
+    last_event_id: Optional[int] = Query(None, description="Resume after this event id (a new EventSource can't send Last-Event-ID)"),
+    authorization: Optional[str] = Header(None),
+    last_event_id_header: Optional[int] = Header(None, alias="Last-Event-ID"),
+):
+    """
+    Server-sent events with grade, invoice, announcement and timetable deltas
+    visible to the caller (see events.py). Authenticate with the usual bearer
+    header or, from EventSource, with ?ticket= from POST /events/ticket.
+    Clients resume with the Last-Event-ID header (sent by EventSource's own
+    reconnects) or ?last_event_id=, and receive what they missed. A ticket is
+    only checked when the stream opens, so once it has expired EventSource's
+    automatic retry is refused: on that error, browsers fetch a new ticket and
+    open a new EventSource with ?last_event_id= set to the last id received.
+    """
+    if last_event_id_header is not None:
+        # Set by the browser on its own reconnects: newer than the URL's
+        last_event_id = last_event_id_header
+    if ticket:
+        token_data = _token_data(ticket, scope=TICKET_SCOPE)
+    elif authorization and authorization.lower().startswith("bearer "):
+        token_data = _token_data(authorization[7:])
+    else:
+        raise _credentials_exception()
+
+    # Short-lived session: a stream may stay open for hours
+    async with AsyncSessionLocal() as db:
+        user = await db.scalar(select(models.User).where(models.User.email == token_data.username))
+        if user is None:
+            raise _credentials_exception()
+        keys = await events.scope_keys(db, user)
+        # Subscribe before reading the backlog so nothing falls in between
+        subscription = events.hub.subscribe(keys)
+        try:
+            backlog = await _replay(db, keys, last_event_id) if last_event_id is not None else []
+        except Exception:
+            events.hub.unsubscribe(subscription)
+            raise
+
+    async def stream():
+        replayed = max((change_id for change_id, _ in backlog if change_id is not None), default=0)
+        try:
+            # Tells the browser how long to wait before reconnecting
+            yield "retry: 3000\n\n"
+            for change_id, event in backlog:
+                yield _format(change_id, event)
+            while True:
+                try:
+                    change_id, event = await asyncio.wait_for(subscription.queue.get(), events.HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is events.RESYNC:
+                    subscription.overflowed = False
+                elif change_id is not None and change_id <= replayed:
+                    continue # Already sent from the backlog
+                yield _format(change_id, event)
+        finally:
+            events.hub.unsubscribe(subscription)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,251 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.sql import Select
+from typing import Dict, Iterator, List, Optional
+import csv
+import datetime
+import enum
+import io
+from .. import models, database
+from .auth import get_current_user
+
+router = APIRouter(prefix="/export", tags=["Export"])
+
+# Rows fetched from the cursor (and written) per chunk
+CHUNK_SIZE = 1000
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+USER_COLUMNS = {
+    "id": models.User.id,
+    "name": models.User.name,
+    "email": models.User.email,
+    "role": models.User.role,
+    "avatar": models.User.avatar,
+    "class_id": models.User.class_id,
+    "max_weekly_hours": models.User.max_weekly_hours,
+    "specialization": models.User.specialization,
+}
+
+GRADE_COLUMNS = {
+    "id": models.Grade.id,
+    "student_id": models.Grade.student_id,
+    "subject": models.Grade.subject,
+    "score": models.Grade.score,
+    "feedback": models.Grade.feedback,
+    "date": models.Grade.date,
+}
+
+INVOICE_COLUMNS = {
+    "id": models.Invoice.id,
+    "parent_id": models.Invoice.parent_id,
+    "student_id": models.Invoice.student_id,
+    "amount": models.Invoice.amount,
+    "currency": models.Invoice.currency,
+    "status": models.Invoice.status,
+    "type": models.Invoice.type,
+    "due_date": models.Invoice.due_date,
+}
+
+
+def require_principal(current_user: models.User = Depends(get_current_user)):
+    if current_user.role != models.UserRole.PRINCIPAL:
+        raise HTTPException(status_code=403, detail="Only the principal can export data")
+    return current_user
+
+
+def _pick_columns(available: Dict, columns: Optional[str]) -> List[str]:
+    if not columns:
+        return list(available)
+    names = [c.strip() for c in columns.split(",") if c.strip()]
+    unknown = [c for c in names if c not in available]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(unknown)}")
+    return names
+
+
+def _plain(value):
+    return value.value if isinstance(value, enum.Enum) else value
+
+
+def _iter_chunks(stmt: Select) -> Iterator[List[tuple]]:
+    # Own connection: the stream outlives the request-scoped session
+    with database.engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=CHUNK_SIZE).execute(stmt)
+        for partition in result.partitions():
+            yield [tuple(_plain(v) for v in row) for row in partition]
+
+
+def _stream_csv(names: List[str], stmt: Select) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for rows in _iter_chunks(stmt):
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+class _ChunkSink:
+    """Write-only file object that hands finished Parquet bytes back to the response stream."""
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _arrow_type(pa, column):
+    python_type = column.type.python_type
+    if issubclass(python_type, enum.Enum) or python_type is str:
+        return pa.string()
+    if python_type is int:
+        return pa.int64()
+    if python_type is float:
+        return pa.float64()
+    if python_type is datetime.date:
+        return pa.date32()
+    return pa.string()
+
+
+def _stream_parquet(names: List[str], available: Dict, stmt: Select) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(name, _arrow_type(pa, available[name])) for name in names])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for rows in _iter_chunks(stmt):
+            # One row group per chunk keeps memory flat
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays([pa.array(col, type=schema.field(i).type) for i, col in enumerate(columns)], schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def _export_response(entity: str, available: Dict, columns: Optional[str], fmt: str, filters: list) -> StreamingResponse:
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{fmt}'")
+    names = _pick_columns(available, columns)
+    stmt = select(*[available[n] for n in names]).where(*filters).order_by(available["id"])
+
+    if fmt == "parquet":
+        try:
+            import pyarrow # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=400, detail="Parquet export requires pyarrow to be installed")
+        body = _stream_parquet(names, available, stmt)
+    else:
+        body = _stream_csv(names, stmt)
+
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{entity}.{fmt}"'}
+    )
+
+
+@router.get("/users")
+def export_users(
+    format: str = "csv",
+    columns: Optional[str] = Query(None, description="Comma separated column names"),
+    role: Optional[models.UserRole] = None,
+    class_id: Optional[str] = None,
+    current_user: models.User = Depends(require_principal)
+):
+    """Stream the user directory (students, parents, teachers) as CSV or Parquet"""
+    filters = []
+    if role is not None:
+        filters.append(models.User.role == role)
+    if class_id is not None:
+        filters.append(models.User.class_id == class_id)
+    return _export_response("users", USER_COLUMNS, columns, format, filters)
+
+
+@router.get("/grades")
+def export_grades(
+    format: str = "csv",
+    columns: Optional[str] = Query(None, description="Comma separated column names"),
+    student_id: Optional[str] = None,
+    subject: Optional[str] = None,
+    class_id: Optional[str] = None,
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+    current_user: models.User = Depends(require_principal)
+):
+    """Stream grades as CSV or Parquet"""
+    filters = []
+    if student_id is not None:
+        filters.append(models.Grade.student_id == student_id)
+    if subject is not None:
+        filters.append(models.Grade.subject == subject)
+    if class_id is not None:
+        filters.append(models.Grade.student_id.in_(
+            select(models.User.id).where(models.User.class_id == class_id)
+        ))
+    if date_from is not None:
+        filters.append(models.Grade.date >= date_from)
+    if date_to is not None:
+        filters.append(models.Grade.date <= date_to)
+    return _export_response("grades", GRADE_COLUMNS, columns, format, filters)
+
+
+@router.get("/invoices")
+def export_invoices(
+    format: str = "csv",
+    columns: Optional[str] = Query(None, description="Comma separated column names"),
+    status: Optional[models.InvoiceStatus] = None,
+    type: Optional[models.InvoiceType] = None,
+    parent_id: Optional[str] = None,
+    student_id: Optional[str] = None,
+    due_from: Optional[datetime.date] = None,
+    due_to: Optional[datetime.date] = None,
+    current_user: models.User = Depends(require_principal)
+):
+    """Stream the invoice ledger as CSV or Parquet"""
+    filters = []
+    if status is not None:
+        filters.append(models.Invoice.status == status)
+    if type is not None:
+        filters.append(models.Invoice.type == type)
+    if parent_id is not None:
+        filters.append(models.Invoice.parent_id == parent_id)
+    if student_id is not None:
+        filters.append(models.Invoice.student_id == student_id)
+    if due_from is not None:
+        filters.append(models.Invoice.due_date >= due_from)
+    if due_to is not None:
+        filters.append(models.Invoice.due_date <= due_to)
+    return _export_response("invoices", INVOICE_COLUMNS, columns, format, filters)
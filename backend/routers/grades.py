@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+from .. import gradebook, models, schemas
+from ..async_database import get_async_db
+from .auth import get_current_user_async
+
+router = APIRouter(prefix="/grades", tags=["Grades"])
+
+@router.post("/batch", response_model=schemas.GradeBatchResult)
+async def upsert_grades(cells: List[schemas.GradeCell], db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
+    """
+    Create or update many grades in one transaction, keyed on (student,
+    subject, date), together with the class/subject aggregates. Teachers may
+    only grade the subjects they teach, and tutors the unassigned subjects of
+    their class (see gradebook.gradable_subjects).
+    """
+    if current_user.role not in (models.UserRole.PRINCIPAL, models.UserRole.TEACHER):
+        raise HTTPException(status_code=403, detail="Only teachers and the principal can enter grades")
+    allowed = None
+    if current_user.role == models.UserRole.TEACHER:
+        allowed = await db.run_sync(gradebook.gradable_subjects, current_user.id)
+    try:
+        result = await db.run_sync(gradebook.upsert_grades, cells, allowed_subjects=allowed)
+    except gradebook.GradebookError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+    await db.commit()
+    return result
@@ -1,19 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from .. import models, schemas, database
+from .. import models, schemas, timetable
+from ..database import get_db
+from ..response_cache import cached
 from typing import List
 import uuid
-import random
 
 router = APIRouter(prefix="/schedule", tags=["Schedule"])
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # --- Availability ---
 
 @router.post("/availability", response_model=schemas.AvailabilityResponse)
@@ -35,7 +30,16 @@ def set_availability(availability: schemas.AvailabilityCreate, db: Session = Dep
         slot_index=availability.slot_index
     )
     db.add(new_avail)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent request inserted the same slot first (unique index)
+        db.rollback()
+        return db.query(models.TeacherAvailability).filter(
+            models.TeacherAvailability.teacher_id == availability.teacher_id,
+            models.TeacherAvailability.day_of_week == availability.day_of_week,
+            models.TeacherAvailability.slot_index == availability.slot_index
+        ).one()
     db.refresh(new_avail)
     return new_avail
 
@@ -111,27 +115,7 @@ def generate_schedule(class_id: str, db: Session = Depends(get_db)):
         valid_slots = {(a.day_of_week, a.slot_index) for a in avails}
         teacher_availability[tid] = valid_slots
 
-    # 5. Simple Backtracking/Greedy Algorithm
-    schedule = [] # List of new ScheduleSlot objects
-    DAYS = ['MON', 'TUE', 'WED', 'THU', 'FRI']
-    SLOTS = range(1, 9) # 8 slots
-    
-    # Expand subjects into "blocks" to place
-    blocks_to_place = []
-    for sub in subjects:
-        for _ in range(sub.hours_weekly):
-            blocks_to_place.append(sub)
-            
-    # Shuffle to vary results if multiple runs
-    random.shuffle(blocks_to_place)
-
-    # Track usage (Global usage check would require checking ALL classes schedules. 
-    # For now, we only check this class's fresh schedule + teacher availability constraint)
-    # TODO: Fetch OTHER classes schedules to avoid teacher double booking implies a global check.
-    # For MVP, we assumed "Main teacher" mostly.
-    # To do it right: 
-    # teacher_occupied = Query(ScheduleSlot).filter(teacher_id in [teachers]).all()
-    
+    # 5. Teachers already teaching other classes at a given time
     # Map: (teacher_id, day, slot) -> Busy
     teacher_busy = set()
     global_schedules = db.query(models.ScheduleSlot).join(models.ClassSubject).filter(
@@ -143,53 +127,19 @@ def generate_schedule(class_id: str, db: Session = Depends(get_db)):
         t_id = slot.subject.teacher_id
         teacher_busy.add((t_id, slot.day_of_week, slot.slot_index))
 
-    # Grid for this class: (day, slot) -> Filled
-    class_grid_filled = set()
-
-    could_not_schedule = []
-
-    for block in blocks_to_place:
-        placed = False
-        # Try to find a slot
-        # Heuristic: Try to spread subjects? For now just find first empty.
-        for day in DAYS:
-            if placed: break
-            for slot_idx in SLOTS:
-                if (day, slot_idx) in class_grid_filled:
-                    continue # Slot taken in this class
-                
-                # Check teacher availability
-                tid = block.teacher_id
-                if tid:
-                    # Constraint 1: Is teacher explicitly available?
-                    # If we follow "Must have availability record", check it.
-                    # If we assume "Available unless busy", skip.
-                    # Let's use the explicit map if it has entries.
-                    if tid in teacher_availability and teacher_availability[tid]:
-                         if (day, slot_idx) not in teacher_availability[tid]:
-                             continue # Teacher not available (e.g. not their working hours)
-
-                    # Constraint 2: Is teacher busy in another class?
-                    if (tid, day, slot_idx) in teacher_busy:
-                        continue
-                
-                # Place it
-                new_slot = models.ScheduleSlot(
-                    id=str(uuid.uuid4()),
-                    class_id=class_id,
-                    subject_id=block.id,
-                    day_of_week=day,
-                    slot_index=slot_idx
-                )
-                schedule.append(new_slot)
-                class_grid_filled.add((day, slot_idx))
-                if tid:
-                    teacher_busy.add((tid, day, slot_idx))
-                placed = True
-                break
-        
-        if not placed:
-            could_not_schedule.append(block.name)
+    # 6. Greedy placement (see timetable.place_subjects)
+    placement = timetable.place_subjects(subjects, teacher_availability, teacher_busy)
+    schedule = [
+        models.ScheduleSlot(
+            id=str(uuid.uuid4()),
+            class_id=class_id,
+            subject_id=block.id,
+            day_of_week=day,
+            slot_index=slot_idx
+        )
+        for block, day, slot_idx in placement.placed
+    ]
+    could_not_schedule = [block.name for block in placement.unplaced]
 
     # Save
     if schedule:
@@ -205,6 +155,8 @@ def generate_schedule(class_id: str, db: Session = Depends(get_db)):
     return db.query(models.ScheduleSlot).filter(models.ScheduleSlot.class_id == class_id).all()
 
 @router.get("/view/{class_id}", response_model=List[schemas.ScheduleSlotResponse])
+# Subject and teacher names are part of each slot
+@cached(List[schemas.ScheduleSlotResponse], depends=["schedule_slots:{class_id}", "class_subjects:{class_id}", "users"])
 def get_schedule(class_id: str, db: Session = Depends(get_db)):
     slots = db.query(models.ScheduleSlot).filter(models.ScheduleSlot.class_id == class_id).all()
     # Populate extra fields
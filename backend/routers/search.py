@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from .. import models, schemas, search
+from ..database import get_db
+from .auth import get_current_user
+
+router = APIRouter(prefix="/search", tags=["Search"])
+
+@router.get("/users", response_model=schemas.UserSearchResponse)
+def search_users(
+    q: str = Query(..., min_length=1, description="Words to prefix-match against name and email"),
+    role: Optional[models.UserRole] = None,
+    class_id: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    facets: bool = Query(False, description="Also return match counts per role and class"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Ranked typeahead search over people"""
+    return search.search_users(db, q, role=role, class_id=class_id, limit=limit, with_facets=facets)
@@ -1,33 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, File, Query, UploadFile
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from typing import List
-from .. import models, schemas, database, auth_utils
+from typing import List, Optional
+from .. import models, schemas, auth_utils, student_import, search, roster, projections, gradebook
+from ..database import get_db
+from ..response_cache import cached
+from ..school_structure import GRADE_NAMES
 from .auth import get_current_user
 
 router = APIRouter(tags=["Students"])
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.get("/students", response_model=List[schemas.UserResponse])
 def get_all_students(
+    fields: Optional[List[str]] = Depends(projections.sparse_fields),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """List all students"""
+    """List all students (only the requested columns with ?fields=)"""
+    if fields:
+        rows = db.execute(projections.user_projection(fields, models.User.role == models.UserRole.STUDENT))
+        return JSONResponse(projections.as_dicts(fields, rows))
     return db.query(models.User).filter(models.User.role == models.UserRole.STUDENT).all()
 
 @router.get("/students/class/{class_id}", response_model=List[schemas.UserResponse])
+@cached(List[schemas.UserResponse], depends=["users:{class_id}"])
 def get_students_by_class(
     class_id: str,
+    fields: Optional[List[str]] = Depends(projections.sparse_fields),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """List students in a specific class"""
+    """List students in a specific class (only the requested columns with ?fields=)"""
+    if fields:
+        rows = db.execute(projections.user_projection(
+            fields, models.User.role == models.UserRole.STUDENT, models.User.class_id == class_id
+        ))
+        return JSONResponse(projections.as_dicts(fields, rows))
     return db.query(models.User).filter(
         models.User.role == models.UserRole.STUDENT,
         models.User.class_id == class_id
@@ -55,10 +63,35 @@ def create_student(
         avatar=student.avatar
     )
     db.add(new_student)
+    search.index_users(db, [new_student.id])
     db.commit()
     db.refresh(new_student)
     return new_student
 
+@router.post("/students/import", response_model=schemas.StudentImportResult)
+def import_students(
+    file: UploadFile = File(...),
+    fmt: Optional[str] = Query(None, alias="format", description="csv or jsonl; guessed from the file name if omitted"),
+    batch_size: int = Query(student_import.DEFAULT_BATCH_SIZE, ge=1, le=5000),
+    dry_run: bool = False,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Bulk import students, with optional linked parents and class assignment.
+    Columns/keys: name, email, password, class_id, avatar, parent_name, parent_email, parent_password.
+    Invalid rows are skipped and reported; valid rows are committed batch by batch.
+    """
+    if current_user.role != models.UserRole.PRINCIPAL:
+        raise HTTPException(status_code=403, detail="Only the principal can import students")
+
+    if fmt is None:
+        fmt = "jsonl" if (file.filename or "").lower().endswith((".jsonl", ".ndjson")) else "csv"
+    if fmt not in student_import.SUPPORTED_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{fmt}'")
+
+    return student_import.import_students(db, file.file, fmt, batch_size=batch_size, dry_run=dry_run)
+
 @router.put("/students/{student_id}", response_model=schemas.UserResponse)
 def update_student(
     student_id: str,
@@ -67,8 +100,8 @@ def update_student(
     current_user: models.User = Depends(get_current_user)
 ):
     """Update student details"""
-    db_student = db.query(models.User).filter(models.User.id == student_id, models.User.role == models.UserRole.STUDENT).first()
-    if not db_student:
+    db_student = db.get(models.User, student_id)
+    if not db_student or db_student.role != models.UserRole.STUDENT:
         raise HTTPException(status_code=404, detail="Student not found")
     
     if student_update.name is not None:
@@ -79,11 +112,16 @@ def update_student(
         if existing_email and existing_email.id != student_id:
              raise HTTPException(status_code=400, detail="Email already used")
         db_student.email = student_update.email
-    if student_update.class_id is not None:
+    if student_update.class_id is not None and student_update.class_id != db_student.class_id:
+        # Their grades now count towards the new class
+        moved_from = db_student.class_id
         db_student.class_id = student_update.class_id
+        db.flush()
+        gradebook.refresh_aggregates(db, {moved_from, student_update.class_id} - {None})
     if student_update.avatar is not None:
         db_student.avatar = student_update.avatar
         
+    search.index_users(db, [student_id])
     db.commit()
     db.refresh(db_student)
     return db_student
@@ -95,16 +133,56 @@ def delete_student(
     current_user: models.User = Depends(get_current_user)
 ):
     """Delete a student"""
-    db_student = db.query(models.User).filter(models.User.id == student_id, models.User.role == models.UserRole.STUDENT).first()
-    if not db_student:
+    db_student = db.get(models.User, student_id)
+    if not db_student or db_student.role != models.UserRole.STUDENT:
         raise HTTPException(status_code=404, detail="Student not found")
     
-    # Optional: Delete related records (Grades, Invoices, Parent associations)
-    # For now, let's keep it simple or assume cascade logic exists or is handled manually
-    # We will manually delete grades and invoices for cleaner deletion
-    db.query(models.Grade).filter(models.Grade.student_id == student_id).delete()
-    db.query(models.Invoice).filter(models.Invoice.student_id == student_id).delete()
-    
-    db.delete(db_student)
+    # Grades, invoices and parent links go in the same transaction
+    roster.delete_students(db, [student_id])
     db.commit()
     return {"message": "Student deleted successfully"}
+
+@router.post("/students/roster/move", response_model=schemas.RosterMoveResult)
+def move_students(
+    request: schemas.RosterMove,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Move a list of students, or a whole class, to another class with a single UPDATE"""
+    if current_user.role != models.UserRole.PRINCIPAL:
+        raise HTTPException(status_code=403, detail="Only the principal can move students between classes")
+    if (request.student_ids is None) == (request.from_class_id is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of student_ids or from_class_id")
+    if db.get(models.ClassGroup, request.target_class_id) is None:
+        raise HTTPException(status_code=404, detail="Target class not found")
+
+    moved = roster.move_students(db, request.target_class_id, student_ids=request.student_ids, from_class_id=request.from_class_id)
+    db.commit()
+    return {"moved": moved}
+
+@router.post("/students/bulk-delete", response_model=schemas.StudentBulkDeleteResult)
+def bulk_delete_students(
+    request: schemas.StudentBulkDelete,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Delete many students (by ids, class or year) and all their dependent rows in one transaction"""
+    if current_user.role != models.UserRole.PRINCIPAL:
+        raise HTTPException(status_code=403, detail="Only the principal can delete students in bulk")
+
+    selectors = [request.student_ids is not None, request.class_id is not None, request.year is not None]
+    if sum(selectors) != 1:
+        raise HTTPException(status_code=400, detail="Provide exactly one of student_ids, class_id or year")
+
+    if request.student_ids is not None:
+        student_ids = request.student_ids
+    elif request.class_id is not None:
+        student_ids = roster.student_ids_for_classes(db, [request.class_id])
+    else:
+        if request.year not in GRADE_NAMES:
+            raise HTTPException(status_code=400, detail=f"Unknown year '{request.year}'")
+        student_ids = roster.student_ids_for_classes(db, roster.class_ids_for_year(db, request.year))
+
+    counts = roster.delete_students(db, student_ids, purge_orphan_parents=request.purge_orphan_parents)
+    db.commit()
+    return counts
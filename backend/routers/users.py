@@ -1,16 +1,33 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from .. import models, schemas, database
+from typing import List, Optional
+from .. import models, schemas, search, projections
+from ..database import get_db
 from .auth import get_current_user
 
 router = APIRouter(tags=["Users"])
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+@router.get("/users", response_model=List[schemas.UserSummary])
+def list_users(
+    role: Optional[models.UserRole] = None,
+    class_id: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 1000,
+    fields: Optional[List[str]] = Depends(projections.sparse_fields),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """User directory: UserSummary entries (or the ?fields= columns), read as column tuples"""
+    names = fields or projections.USER_SUMMARY_FIELDS
+    filters = []
+    if role is not None:
+        filters.append(models.User.role == role)
+    if class_id is not None:
+        filters.append(models.User.class_id == class_id)
+    rows = db.execute(projections.user_projection(names, *filters).offset(skip).limit(limit))
+    # Rows already have the response shape: skip response_model validation
+    return JSONResponse(projections.as_dicts(names, rows))
 
 @router.put("/users/{user_id}", response_model=schemas.UserResponse)
 def update_user(
@@ -24,7 +41,8 @@ def update_user(
     Ideally restricted to Principal or the user themselves.
     """
     # 1. Fetch User
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+    # Identity map hit when users edit themselves: current_user was loaded by this session
+    db_user = db.get(models.User, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -53,6 +71,7 @@ def update_user(
     if user_update.avatar is not None:
         db_user.avatar = user_update.avatar
 
+    search.index_users(db, [user_id])
     db.commit()
     db.refresh(db_user)
     return db_user
@@ -1,11 +1,16 @@
-from pydantic import BaseModel
-from typing import List, Optional, Union
+from pydantic import BaseModel, Field
+import datetime
+from typing import Any, Dict, List, Optional, Union
 from .models import UserRole, InvoiceStatus, InvoiceType, EducationLevel
 
 class Token(BaseModel):
     access_token: str
     token_type: str
 
+class EventTicket(BaseModel):
+    ticket: str # Pass as /events?ticket=
+    expires_in: int # Seconds left to open the stream with it
+
 class TokenData(BaseModel):
     username: Optional[str] = None
 
@@ -14,7 +19,7 @@ class GradeBase(BaseModel):
     subject: str
     score: float
     feedback: str
-    date: str
+    date: Optional[datetime.date] = None # NULL only for legacy rows whose date couldn't be parsed
 
 class GradeResponse(GradeBase):
     id: str
@@ -23,12 +28,40 @@ class GradeResponse(GradeBase):
     class Config:
         from_attributes = True
 
+class GradeCell(BaseModel):
+    student_id: str
+    subject: str
+    score: float = Field(ge=0, le=10)
+    date: Optional[datetime.date] = None # Defaults to today; (student, subject, date) identifies the grade
+    feedback: Optional[str] = None # Kept as is on update when omitted
+
+class GradeAggregateResponse(BaseModel):
+    class_id: str
+    subject: str
+    count: int
+    mean: Optional[float] = None
+    stddev: Optional[float] = None
+
+class GradeBatchResult(BaseModel):
+    created: int
+    updated: int
+    aggregates: List[GradeAggregateResponse] # The (class, subject) pairs the batch touched
+
+class ClassGradebook(BaseModel):
+    class_id: str
+    student_ids: List[str] # Ordered by name
+    subjects: List[str]
+    # Average score of student i in subject j at [i * len(subjects) + j], None where ungraded
+    scores: List[Optional[float]]
+    row_averages: List[Optional[float]] # Per student, over the subjects they have grades in
+    column_averages: List[Optional[float]] # Per subject, over the students with grades in it
+
 class InvoiceBase(BaseModel):
     amount: float
     currency: str
     status: InvoiceStatus
     type: InvoiceType
-    due_date: str
+    due_date: Optional[datetime.date] = None # NULL only for legacy rows whose date couldn't be parsed
 
 class InvoiceResponse(InvoiceBase):
     id: str
@@ -41,7 +74,7 @@ class InvoiceResponse(InvoiceBase):
 class AnnouncementBase(BaseModel):
     title: str
     content: str
-    date: str
+    date: Optional[datetime.date] = None # NULL only for legacy rows whose date couldn't be parsed
 
 class AnnouncementResponse(AnnouncementBase):
     id: str
@@ -51,6 +84,10 @@ class AnnouncementResponse(AnnouncementBase):
     class Config:
         from_attributes = True
 
+class AnnouncementFeed(BaseModel):
+    items: List[AnnouncementResponse]
+    next_cursor: Optional[str] = None # Pass as ?cursor= for the next page; None on the last one
+
 class ClassGroupBase(BaseModel):
     name: str
     level: EducationLevel
@@ -104,12 +141,84 @@ class UserResponse(UserBase):
     class Config:
         from_attributes = True
 
+class UserSummary(BaseModel):
+    """Slim directory entry, built from selected columns rather than User objects"""
+    id: str
+    name: str
+    role: UserRole
+    avatar: Optional[str] = None
+    class_id: Optional[str] = None
+
 class StudentUpdate(BaseModel):
     name: Optional[str] = None
     email: Optional[str] = None
     class_id: Optional[str] = None
     avatar: Optional[str] = None
 
+class StudentImportRow(BaseModel):
+    """One line of a student import file (CSV columns or JSONL keys)."""
+    name: str
+    email: str
+    password: str
+    class_id: Optional[str] = None
+    avatar: Optional[str] = 'https://picsum.photos/200'
+    # Optional linked parent; an existing parent account is matched by email
+    parent_name: Optional[str] = None
+    parent_email: Optional[str] = None
+    parent_password: Optional[str] = None
+
+class ImportRowError(BaseModel):
+    row: int # 1-based record number, header excluded
+    email: Optional[str] = None
+    error: str
+
+class StudentImportResult(BaseModel):
+    imported: int
+    parents_created: int
+    parents_linked: int
+    errors: List[ImportRowError]
+
+class StudentBulkDelete(BaseModel):
+    # Exactly one selector: explicit ids, one class, or a whole year (e.g. "6º Primaria")
+    student_ids: Optional[List[str]] = None
+    class_id: Optional[str] = None
+    year: Optional[str] = None
+    purge_orphan_parents: bool = False
+
+class StudentBulkDeleteResult(BaseModel):
+    students: int
+    grades: int
+    invoices: int
+    parent_links: int
+    parents: int
+
+class RosterMove(BaseModel):
+    # Either explicit students or everyone currently in from_class_id
+    target_class_id: str
+    student_ids: Optional[List[str]] = None
+    from_class_id: Optional[str] = None
+
+class RosterMoveResult(BaseModel):
+    moved: int
+
+class ClassPromotion(BaseModel):
+    class_id: str
+    from_name: str
+    to_name: str
+    graduating: bool
+
+class PromotionResult(BaseModel):
+    promoted: List[ClassPromotion]
+    graduated_students: int
+    skipped: List[str] # Class ids whose names don't match the school structure
+    deleted: Optional[StudentBulkDeleteResult] = None
+    # Curriculum reset of the promoted classes (what would happen, on a dry run)
+    subjects_removed: int = 0
+    subjects_created: int = 0 # From the subject templates of each class's new year
+    schedule_slots_removed: int = 0
+    announcements_removed: int = 0 # Of recycled (graduated) classes
+    kept_curriculum: List[str] = [] # Class ids left with their subjects: no templates for their new year
+
 class UserUpdate(BaseModel):
     name: Optional[str] = None
     email: Optional[str] = None
@@ -118,6 +227,19 @@ class UserUpdate(BaseModel):
     specialization: Optional[str] = None
     max_weekly_hours: Optional[int] = None
 
+class UserSearchHit(BaseModel):
+    id: str
+    name: str
+    email: str
+    role: UserRole
+    avatar: Optional[str] = None
+    class_id: Optional[str] = None
+
+class UserSearchResponse(BaseModel):
+    results: List[UserSearchHit]
+    # {"role": {"STUDENT": 12, ...}, "class_id": {"class_0": 3, ...}} when requested
+    facets: Optional[Dict[str, Dict[str, int]]] = None
+
 class BootstrapData(BaseModel):
     users: List[UserResponse]
     classes: List[ClassGroupResponse]
@@ -125,6 +247,10 @@ class BootstrapData(BaseModel):
     invoices: List[InvoiceResponse]
     announcements: List[AnnouncementResponse]
 
+class SparseBootstrapData(BootstrapData):
+    # Only the columns requested with ?fields=
+    users: List[Dict[str, Any]]
+
 class DashboardSummary(BaseModel):
     total_students: int
     total_teachers: int
@@ -183,4 +309,48 @@ class SubjectTemplateResponse(SubjectTemplateBase):
     class Config:
         from_attributes = True
 
+class SubjectTemplateBulkResult(BaseModel):
+    created: int
+    updated: int
+    templates: List[SubjectTemplateResponse]
+
+# Shape of the official curriculum JSON (see seed_official_curriculum.py)
+class CurriculumSubject(BaseModel):
+    nombre: str
+    horas: float
+
+class OfficialCurriculum(BaseModel):
+    comunidad_autonoma: Optional[str] = None
+    etapa_educativa: Optional[str] = None
+    asignaturas_y_horas: Dict[str, List[CurriculumSubject]] # Keys like "1_Primaria"
+
+# --- Diagnostics ---
+
+class SlowQuery(BaseModel):
+    at: str
+    duration_ms: float
+    statement: str
+    parameters: Union[Dict[str, str], List[str]] # Types/lengths only, never values
+    rows: Optional[int] = None # executemany batch size
+    method: Optional[str] = None
+    route: Optional[str] = None
+    plan: Optional[List[str]] = None
+    plan_error: Optional[str] = None
+
+class SlowQueryLogResponse(BaseModel):
+    enabled: bool
+    threshold_ms: Optional[float] = None
+    samples: List[SlowQuery]
+
+class ProfileInfo(BaseModel):
+    id: str
+    created: str
+    method: str
+    path: str
+    route: Optional[str] = None
+    status: int
+    trigger: str # "header" or "sampled"
+    duration_ms: float
+    samples: int
+
 UserResponse.update_forward_refs()
@@ -0,0 +1,52 @@
+"""
+Grade sequence of the school, shared by seeding and roster operations.
+
+Class names follow "<grade> <group>", e.g. "3º Primaria B" (see seed.py).
+"""
+from typing import Optional, Tuple
+from .models import EducationLevel
+
+# Ordered from the entry year to the final year
+GRADES = [
+    ("Infantil 3 años", EducationLevel.INFANTIL),
+    ("Infantil 4 años", EducationLevel.INFANTIL),
+    ("Infantil 5 años", EducationLevel.INFANTIL),
+    ("1º Primaria", EducationLevel.PRIMARIA),
+    ("2º Primaria", EducationLevel.PRIMARIA),
+    ("3º Primaria", EducationLevel.PRIMARIA),
+    ("4º Primaria", EducationLevel.PRIMARIA),
+    ("5º Primaria", EducationLevel.PRIMARIA),
+    ("6º Primaria", EducationLevel.PRIMARIA),
+    ("1º ESO", EducationLevel.SECUNDARIA),
+    ("2º ESO", EducationLevel.SECUNDARIA),
+    ("3º ESO", EducationLevel.SECUNDARIA),
+    ("4º ESO", EducationLevel.SECUNDARIA),
+]
+
+GRADE_NAMES = [name for name, _ in GRADES]
+
+# Longest first so "1º ESO" never shadows a longer grade name
+_BY_LENGTH = sorted(GRADE_NAMES, key=len, reverse=True)
+
+
+def split_class_name(class_name: str) -> Tuple[Optional[str], str]:
+    """'3º Primaria B' -> ('3º Primaria', 'B'). Unknown names -> (None, class_name)."""
+    for grade in _BY_LENGTH:
+        if class_name == grade or class_name.startswith(grade + " "):
+            return grade, class_name[len(grade):].strip()
+    return None, class_name
+
+
+def grade_number(grade: str) -> int:
+    """Year within its level, as subject templates number them: '3º Primaria' -> 3, 'Infantil 3 años' -> 1."""
+    index = GRADE_NAMES.index(grade)
+    level = GRADES[index][1]
+    return index - next(i for i, (_, l) in enumerate(GRADES) if l == level) + 1
+
+
+def next_grade(grade: str) -> Optional[Tuple[str, EducationLevel]]:
+    """Grade that follows `grade`, or None for the final year."""
+    index = GRADE_NAMES.index(grade)
+    if index + 1 >= len(GRADES):
+        return None
+    return GRADES[index + 1]
@@ -0,0 +1,164 @@
+"""
+Full-text search over people, backed by an SQLite FTS5 table.
+
+`users_fts` mirrors users.name and users.email for ranking and prefix matching,
+plus role and class_id (unindexed) for filtering and facet counts. Rows are
+tied to users by user_id (unindexed), never by rowid: users has a TEXT primary
+key, so VACUUM may renumber its rowids. The index is maintained explicitly:
+endpoints that write users call `index_users` (after the write) or
+`remove_users` (before the delete) inside the same transaction.
+
+On other databases the index functions do nothing and `search_users` falls back
+to a LIKE match.
+"""
+import re
+from typing import Dict, List, Optional
+from sqlalchemy import bindparam, func, or_, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from . import models
+
+FTS_TABLE = "users_fts"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+_CREATE_SQL = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    name, email, user_id UNINDEXED, role UNINDEXED, class_id UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+_INDEX_SQL = text(f"""
+INSERT INTO {FTS_TABLE}(name, email, user_id, role, class_id)
+SELECT name, email, id, role, class_id FROM users WHERE id IN :ids
+""").bindparams(bindparam("ids", expanding=True))
+
+_REMOVE_SQL = text(f"""
+DELETE FROM {FTS_TABLE} WHERE user_id IN :ids
+""").bindparams(bindparam("ids", expanding=True))
+
+
+def is_supported(bind) -> bool:
+    return bind.dialect.name == "sqlite"
+
+
+def rebuild_index(conn: Connection):
+    conn.exec_driver_sql(f"DELETE FROM {FTS_TABLE}")
+    conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}(name, email, user_id, role, class_id) SELECT name, email, id, role, class_id FROM users")
+
+
+def _has_drifted(conn: Connection) -> bool:
+    # Compares ids, not just counts: the same number of rows can still point at the wrong users
+    indexed = conn.exec_driver_sql(f"SELECT count(*) FROM {FTS_TABLE}").scalar()
+    total = conn.exec_driver_sql("SELECT count(*) FROM users").scalar()
+    if indexed != total:
+        return True
+    stray = conn.exec_driver_sql(f"SELECT 1 FROM (SELECT user_id FROM {FTS_TABLE} EXCEPT SELECT id FROM users) LIMIT 1").first()
+    return stray is not None
+
+
+def ensure_index(engine: Engine, rebuild: bool = False):
+    """Create the FTS table if needed and rebuild it when forced or when it has drifted from users."""
+    if not is_supported(engine):
+        return
+    with engine.begin() as conn:
+        columns = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({FTS_TABLE})")}
+        if columns and "user_id" not in columns:
+            # Built by an older version, keyed on users.rowid
+            conn.exec_driver_sql(f"DROP TABLE {FTS_TABLE}")
+            rebuild = True
+        conn.exec_driver_sql(_CREATE_SQL)
+        if rebuild or _has_drifted(conn):
+            rebuild_index(conn)
+
+
+def index_users(db: Session, user_ids: List[str]):
+    """(Re)index users after they were created or updated. Caller commits."""
+    if not user_ids or not is_supported(db.get_bind()):
+        return
+    db.flush()
+    db.execute(_REMOVE_SQL, {"ids": list(user_ids)})
+    db.execute(_INDEX_SQL, {"ids": list(user_ids)})
+
+
+def remove_users(db: Session, user_ids: List[str]):
+    """Drop users from the index. Must run before the users rows are deleted."""
+    if not user_ids or not is_supported(db.get_bind()):
+        return
+    db.flush()
+    db.execute(_REMOVE_SQL, {"ids": list(user_ids)})
+
+
+def build_match_query(q: str) -> Optional[str]:
+    """'mar gar' -> '"mar"* "gar"*' (every term must prefix-match a token)"""
+    tokens = _TOKEN_RE.findall(q)
+    if not tokens:
+        return None
+    return " ".join(f'"{t}"*' for t in tokens)
+
+
+def search_users(db: Session, q: str, role: Optional[models.UserRole] = None, class_id: Optional[str] = None,
+                 limit: int = 20, with_facets: bool = False) -> Dict:
+    match = build_match_query(q)
+    if match is None:
+        return {"results": [], "facets": None}
+    if not is_supported(db.get_bind()):
+        return _search_users_like(db, q, role, class_id, limit, with_facets)
+
+    filters = ""
+    params = {"match": match, "limit": limit}
+    if role is not None:
+        filters += " AND f.role = :role"
+        params["role"] = role.value
+    if class_id is not None:
+        filters += " AND f.class_id = :class_id"
+        params["class_id"] = class_id
+
+    # bm25 weights: a hit in the name counts more than a hit in the email
+    rows = db.execute(text(f"""
+        SELECT u.id, u.name, u.email, u.role, u.avatar, u.class_id
+        FROM {FTS_TABLE} f JOIN users u ON u.id = f.user_id
+        WHERE {FTS_TABLE} MATCH :match{filters}
+        ORDER BY bm25({FTS_TABLE}, 10.0, 1.0)
+        LIMIT :limit
+    """), params).mappings().all()
+
+    facets = None
+    if with_facets:
+        facets = {}
+        for column in ("role", "class_id"):
+            counts = db.execute(text(f"""
+                SELECT {column}, count(*) FROM {FTS_TABLE}
+                WHERE {FTS_TABLE} MATCH :match GROUP BY {column}
+            """), {"match": match}).all()
+            facets[column] = {key or "": count for key, count in counts}
+
+    return {"results": [dict(r) for r in rows], "facets": facets}
+
+
+def _search_users_like(db: Session, q: str, role, class_id, limit: int, with_facets: bool) -> Dict:
+    conditions = []
+    for token in _TOKEN_RE.findall(q):
+        pattern = f"%{token}%"
+        conditions.append(or_(models.User.name.ilike(pattern), models.User.email.ilike(pattern)))
+
+    stmt = select(
+        models.User.id, models.User.name, models.User.email,
+        models.User.role, models.User.avatar, models.User.class_id
+    ).where(*conditions)
+    if role is not None:
+        stmt = stmt.where(models.User.role == role)
+    if class_id is not None:
+        stmt = stmt.where(models.User.class_id == class_id)
+    rows = db.execute(stmt.order_by(models.User.name).limit(limit)).mappings().all()
+
+    facets = None
+    if with_facets:
+        facets = {}
+        for column in (models.User.role, models.User.class_id):
+            counts = db.execute(select(column, func.count()).where(*conditions).group_by(column)).all()
+            facets[column.key] = {(getattr(key, "value", key) or ""): count for key, count in counts}
+
+    return {"results": [dict(r) for r in rows], "facets": facets}
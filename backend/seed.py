@@ -1,9 +1,13 @@
 import random
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from sqlalchemy.orm import Session
 from .database import SessionLocal, engine, Base
 from .models import User, UserRole, ClassGroup, Grade, Invoice, InvoiceStatus, InvoiceType, Announcement, parent_student_association, EducationLevel
 from .auth_utils import get_password_hash
+from .search import ensure_index
+from . import gradebook, invalidation
+from .migrations import upgrade_database
+from .school_structure import GRADES
 
 # --- Data Arrays from dataGenerator.ts ---
 firstNamesMale = ["Santiago", "Mateo", "Sebastián", "Leonardo", "Matías", "Diego", "Alejandro", "Daniel", "Lucas", "Tomás", "Gabriel", "Martín", "Nicolás", "Samuel", "David", "Juan", "Pedro", "Pablo", "Hugo", "Álvaro", "Adrián", "Enzo", "Leo", "Mario", "Manuel"]
@@ -26,7 +30,7 @@ def generate_email(name: str, role: str):
 
 def seed_data():
     Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
+    upgrade_database(engine)
     
     db = SessionLocal()
     
@@ -78,29 +82,13 @@ def seed_data():
     print("Creating Classes...")
     classes = []
     
-    # Full School Structure
+    # Full School Structure (school_structure.GRADES)
     # Infantil: 3, 4, 5 years
     # Primaria: 1st to 6th
     # Secundaria: 1st to 4th
-    
-    structure = [
-        ("Infantil 3 años", EducationLevel.INFANTIL),
-        ("Infantil 4 años", EducationLevel.INFANTIL),
-        ("Infantil 5 años", EducationLevel.INFANTIL),
-        ("1º Primaria", EducationLevel.PRIMARIA),
-        ("2º Primaria", EducationLevel.PRIMARIA),
-        ("3º Primaria", EducationLevel.PRIMARIA),
-        ("4º Primaria", EducationLevel.PRIMARIA),
-        ("5º Primaria", EducationLevel.PRIMARIA),
-        ("6º Primaria", EducationLevel.PRIMARIA),
-        ("1º ESO", EducationLevel.SECUNDARIA),
-        ("2º ESO", EducationLevel.SECUNDARIA),
-        ("3º ESO", EducationLevel.SECUNDARIA),
-        ("4º ESO", EducationLevel.SECUNDARIA),
-    ]
 
     class_cnt = 0
-    for grade_name, level in structure:
+    for grade_name, level in GRADES:
         # Create Group A and Group B for each grade
         for group in ["A", "B"]:
             class_name = f"{grade_name} {group}"
@@ -173,7 +161,7 @@ def seed_data():
                     subject=sub,
                     score=float(min(10, max(1, base_score))),
                     feedback=get_random_element(["Buen trabajo", "Puede mejorar", "Excelente", "Necesita repasar", "Progresa adecuadamente"]),
-                    date=datetime.now().date().isoformat()
+                    date=datetime.now().date()
                 )
                 db.add(grade)
             
@@ -191,7 +179,7 @@ def seed_data():
                         currency='EUR',
                         status=InvoiceStatus.PENDING if random.random() > 0.7 else InvoiceStatus.PAID,
                         type=type,
-                        due_date='2025-12-01'
+                        due_date=date(2025, 12, 1)
                     )
                     db.add(invoice)
 
@@ -199,7 +187,7 @@ def seed_data():
     ann1 = Announcement(
         id='ann_1', author_id=principal.id, title='Bienvenida al Curso 2024-2025',
         content='Esperamos que este nuevo año escolar esté lleno de aprendizaje.',
-        date='2025-09-01'
+        date=date(2025, 9, 1)
     )
     db.add(ann1)
 
@@ -208,7 +196,7 @@ def seed_data():
         if random.random() > 0.5:
             ann = Announcement(
                 id=f'ann_{cls.id}', author_id=cls.teacher_id, title=f'Excursión de {cls.name}',
-                content='Traer autorización firmada y ropa cómoda.', date='2025-10-15', target_class_id=cls.id
+                content='Traer autorización firmada y ropa cómoda.', date=date(2025, 10, 15), target_class_id=cls.id
             )
             db.add(ann)
 
@@ -235,8 +223,14 @@ def seed_data():
     demo_student.parents.append(demo_parent)
     # -----------------------------------------------------------------------
 
+    db.flush()
+    gradebook.refresh_aggregates(db)
     db.commit()
     db.close()
+    # Users were replaced wholesale: resync the search index
+    ensure_index(engine, rebuild=True)
+    # Running workers (and persisted responses) still hold the old data
+    invalidation.announce(engine)
     print("Database seeded successfully!")
 
 if __name__ == "__main__":
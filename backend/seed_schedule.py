@@ -1,4 +1,5 @@
-from .database import SessionLocal, engine, Base
+from .database import SessionLocal, engine
+from .migrations import upgrade_database
 from . import models
 from .models import User, UserRole, ClassGroup, EducationLevel, ClassSubject, ScheduleSlot
 import uuid
@@ -14,14 +15,8 @@ def get_db():
 def seed_data():
     db = SessionLocal()
     
-    # Ensure tables exist (especially new columns)
-    # In a real prod env we would use Alembic, but for this dev setup we might need to 
-    # force create if they don't exist, or assumption is they are created by main.py startup.
-    # However, since we added columns, existing SQLite might complain if we don't migrate.
-    # For this safe local setup, we'll try to just run it and see.
-    # If it fails due to missing column, we might need to recreate the DB or manually alter.
-    # Given the context, I'll proceed assuming the user might reset DB or I handles it.
-    Base.metadata.create_all(bind=engine)
+    # Ensure tables and columns exist
+    upgrade_database(engine)
 
     print("--- Starting Schedule & Teacher Seeding ---")
 
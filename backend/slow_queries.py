@@ -0,0 +1,125 @@
+"""
+Opt-in slow-query recorder.
+
+Enabled by setting SLOW_QUERY_MS. Any statement that runs longer than that is
+kept in a fixed-size ring buffer (SLOW_QUERY_BUFFER entries, oldest dropped)
+with the shape of its bound parameters (types and list lengths, never the
+values), the route that issued it, and its query plan: EXPLAIN QUERY PLAN on
+SQLite, EXPLAIN on other databases. The plan is taken right after the
+statement, on the same connection and with the same parameters.
+"""
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from .metrics import current_request
+
+SLOW_QUERY_MS = os.getenv("SLOW_QUERY_MS")
+BUFFER_SIZE = int(os.getenv("SLOW_QUERY_BUFFER", 200))
+
+# DDL, PRAGMA, transaction control and the like are never explained
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+def _shape(value) -> str:
+    if isinstance(value, (list, tuple, set)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+def parameter_shape(parameters, executemany: bool):
+    if executemany:
+        parameters = parameters[0] if parameters else ()
+    if isinstance(parameters, dict):
+        return {key: _shape(value) for key, value in parameters.items()}
+    return [_shape(value) for value in parameters or ()]
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms: float, size: int = BUFFER_SIZE):
+        self.threshold = threshold_ms / 1000
+        self.samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["slow_query_start"].pop()
+        if elapsed < self.threshold:
+            return
+        request = current_request()
+        plan, plan_error = self._explain(conn, cursor, statement, parameters, executemany)
+        sample = {
+            "at": datetime.utcnow().isoformat(timespec="seconds"),
+            "duration_ms": round(elapsed * 1000, 2),
+            "statement": statement,
+            "parameters": parameter_shape(parameters, executemany),
+            "rows": len(parameters) if executemany else None,
+            "method": request.method if request else None,
+            "route": request.route if request else None,
+            "plan": plan,
+            "plan_error": plan_error,
+        }
+        with self._lock:
+            self.samples.append(sample)
+
+    def _handle_error(self, exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("slow_query_start"):
+            conn.info["slow_query_start"].pop()
+
+    def _explain(self, conn, cursor, statement, parameters, executemany):
+        if not statement.lstrip().upper().startswith(EXPLAINABLE):
+            return None, None
+        if executemany:
+            parameters = parameters[0] if parameters else ()
+        prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+        # Server databases abort the transaction on error: isolate the EXPLAIN in a savepoint
+        savepoint = conn.dialect.name != "sqlite"
+        # Raw DBAPI cursor: the plan query itself is not instrumented
+        explain_cursor = conn.connection.cursor()
+        try:
+            if savepoint:
+                explain_cursor.execute("SAVEPOINT slow_query_explain")
+            explain_cursor.execute(prefix + statement, parameters)
+            rows = explain_cursor.fetchall()
+            if savepoint:
+                explain_cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+        except Exception as e:
+            if savepoint:
+                explain_cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            return None, str(e)
+        finally:
+            explain_cursor.close()
+        # SQLite rows are (id, parent, notused, detail); EXPLAIN returns one text column
+        return [str(row[-1]) for row in rows], None
+
+    def recent(self, limit: Optional[int] = None) -> List[Dict]:
+        with self._lock:
+            samples = list(self.samples)
+        samples.reverse()
+        return samples[:limit] if limit else samples
+
+    def clear(self):
+        with self._lock:
+            self.samples.clear()
+
+    def install(self, engine: Engine):
+        """Attach to a (sync) engine. For an AsyncEngine pass engine.sync_engine."""
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+        event.listen(engine, "handle_error", self._handle_error)
+
+
+# None unless SLOW_QUERY_MS is set
+slow_query_log = SlowQueryLog(float(SLOW_QUERY_MS)) if SLOW_QUERY_MS else None
+
+
+def install(engine: Engine):
+    if slow_query_log is not None:
+        slow_query_log.install(engine)
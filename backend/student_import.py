@@ -0,0 +1,218 @@
+"""
+Streaming bulk import of students (and their parents) from CSV or JSONL.
+
+Records are read lazily from the uploaded file and handled in batches: one
+SELECT per batch checks email uniqueness, passwords are hashed on a thread
+pool, and users and parent links are written with executemany. Invalid rows
+are reported and skipped; every batch is committed on its own.
+"""
+import codecs
+import csv
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from . import models, schemas, auth_utils, search
+
+DEFAULT_BATCH_SIZE = 500
+SUPPORTED_FORMATS = ("csv", "jsonl")
+
+# (row number, parsed record or None, parse error or None)
+Record = Tuple[int, Optional[dict], Optional[str]]
+
+# Threads, not processes: argon2-cffi releases the GIL while hashing, and
+# forking a worker that runs the invalidation poller and holds open database
+# connections is unsafe. Each hash also takes argon2's memory cost, so the
+# pool stays small (and is shared by every import on this worker).
+HASH_WORKERS = int(os.getenv("IMPORT_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+
+_hash_pool: Optional[ThreadPoolExecutor] = None
+_hash_pool_lock = threading.Lock()
+
+
+def _get_hash_pool() -> ThreadPoolExecutor:
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            _hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="password-hash")
+    return _hash_pool
+
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """Argon2 is CPU bound by design, so spread the batch across HASH_WORKERS threads."""
+    if len(passwords) < 2 or HASH_WORKERS < 2:
+        return [auth_utils.get_password_hash(p) for p in passwords]
+    return list(_get_hash_pool().map(auth_utils.get_password_hash, passwords))
+
+
+def iter_records(stream: IO[bytes], fmt: str) -> Iterator[Record]:
+    lines = codecs.iterdecode(stream, "utf-8-sig")
+    if fmt == "csv":
+        for row, record in enumerate(csv.DictReader(lines), start=1):
+            # Empty cells mean "not provided"
+            yield row, {k.strip(): (v.strip() or None) if isinstance(v, str) else v for k, v in record.items() if k}, None
+        return
+
+    row = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row, None, f"Invalid JSON: {e.msg}"
+            continue
+        if not isinstance(record, dict):
+            yield row, None, "Each line must be a JSON object"
+            continue
+        yield row, record, None
+
+
+def _format_validation_error(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+
+
+class StudentImporter:
+    def __init__(self, db: Session, dry_run: bool = False):
+        self.db = db
+        self.dry_run = dry_run
+        self.valid_class_ids = {cid for (cid,) in db.query(models.ClassGroup.id)}
+        self.seen_emails = set() # Every email claimed earlier in this file
+        self.parent_ids: Dict[str, str] = {} # Parent email -> user id, for siblings
+        self.imported = 0
+        self.parents_created = 0
+        self.parents_linked = 0
+        self.errors: List[schemas.ImportRowError] = []
+
+    def run(self, records: Iterable[Record], batch_size: int = DEFAULT_BATCH_SIZE) -> schemas.StudentImportResult:
+        batch: List[Record] = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                self._process_batch(batch)
+                batch = []
+        if batch:
+            self._process_batch(batch)
+        return schemas.StudentImportResult(
+            imported=self.imported,
+            parents_created=self.parents_created,
+            parents_linked=self.parents_linked,
+            errors=sorted(self.errors, key=lambda e: e.row)
+        )
+
+    def _error(self, row: int, email: Optional[str], message: str):
+        self.errors.append(schemas.ImportRowError(row=row, email=email, error=message))
+
+    def _process_batch(self, batch: List[Record]):
+        # 1. Validate shapes
+        valid: List[Tuple[int, schemas.StudentImportRow]] = []
+        for row, data, parse_error in batch:
+            if parse_error:
+                self._error(row, None, parse_error)
+                continue
+            try:
+                valid.append((row, schemas.StudentImportRow(**data)))
+            except ValidationError as e:
+                self._error(row, data.get("email"), _format_validation_error(e))
+
+        # 2. One set-based uniqueness check for the whole batch
+        emails = {rec.email for _, rec in valid} | {rec.parent_email for _, rec in valid if rec.parent_email}
+        existing = {}
+        if emails:
+            existing = {
+                email: (user_id, role)
+                for user_id, email, role in self.db.query(models.User.id, models.User.email, models.User.role)
+                                                   .filter(models.User.email.in_(emails))
+            }
+
+        # 3. Build rows; passwords are hashed afterwards in one parallel pass
+        users: List[dict] = []
+        passwords: List[str] = []
+        links: List[dict] = []
+        for row, rec in valid:
+            if rec.email in existing or rec.email in self.seen_emails:
+                self._error(row, rec.email, "Email already registered")
+                continue
+            if rec.class_id and rec.class_id not in self.valid_class_ids:
+                self._error(row, rec.email, f"Class '{rec.class_id}' not found")
+                continue
+
+            parent_id = None
+            new_parent = None
+            if rec.parent_email:
+                if rec.parent_email == rec.email:
+                    self._error(row, rec.email, "Parent email must differ from the student email")
+                    continue
+                if rec.parent_email in self.parent_ids:
+                    parent_id = self.parent_ids[rec.parent_email]
+                elif rec.parent_email in existing:
+                    parent_id, role = existing[rec.parent_email]
+                    if role != models.UserRole.PARENT:
+                        self._error(row, rec.email, "Parent email belongs to a non-parent account")
+                        continue
+                elif rec.parent_email in self.seen_emails:
+                    self._error(row, rec.email, "Parent email already used by a student in this file")
+                    continue
+                else:
+                    if not rec.parent_name or not rec.parent_password:
+                        self._error(row, rec.email, "parent_name and parent_password are required for a new parent")
+                        continue
+                    new_parent = {
+                        "id": f"u_{uuid.uuid4().hex[:12]}",
+                        "name": rec.parent_name,
+                        "email": rec.parent_email,
+                        "role": models.UserRole.PARENT,
+                        "avatar": 'https://picsum.photos/200',
+                        "class_id": None,
+                    }
+                    parent_id = new_parent["id"]
+            elif rec.parent_name:
+                self._error(row, rec.email, "parent_email is required to link a parent")
+                continue
+
+            student = {
+                "id": f"u_{uuid.uuid4().hex[:12]}",
+                "name": rec.name,
+                "email": rec.email,
+                "role": models.UserRole.STUDENT,
+                "avatar": rec.avatar,
+                "class_id": rec.class_id,
+            }
+            users.append(student)
+            passwords.append(rec.password)
+            self.seen_emails.add(rec.email)
+            self.imported += 1
+
+            if new_parent:
+                users.append(new_parent)
+                passwords.append(rec.parent_password)
+                self.seen_emails.add(rec.parent_email)
+                self.parent_ids[rec.parent_email] = parent_id
+                self.parents_created += 1
+            elif parent_id:
+                self.parent_ids[rec.parent_email] = parent_id
+                self.parents_linked += 1
+            if parent_id:
+                links.append({"parent_id": parent_id, "student_id": student["id"]})
+
+        if self.dry_run or not users:
+            return
+
+        # 4. Hash in parallel, then executemany
+        for user, hashed in zip(users, hash_passwords(passwords)):
+            user["hashed_password"] = hashed
+        self.db.execute(insert(models.User), users)
+        if links:
+            self.db.execute(insert(models.parent_student_association), links)
+        search.index_users(self.db, [user["id"] for user in users])
+        self.db.commit()
+
+
+def import_students(db: Session, stream: IO[bytes], fmt: str, batch_size: int = DEFAULT_BATCH_SIZE, dry_run: bool = False) -> schemas.StudentImportResult:
+    return StudentImporter(db, dry_run=dry_run).run(iter_records(stream, fmt), batch_size=batch_size)
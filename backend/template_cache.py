@@ -0,0 +1,84 @@
+"""
+In-process cache for subject templates.
+
+Templates change a couple of times per year (official curriculum seeding), but
+CurriculumSetup asks for them on every render. We keep every template in memory,
+indexed by (education_level, grade), and only reload when the version stamp
+stored in `cache_versions` changes. Any code that writes `subject_templates`
+(endpoints or seeding scripts) must call `bump_version` before committing.
+The cache also subscribes to the invalidation bus (invalidation.py), which
+catches template writes that never bumped the stamp.
+"""
+import threading
+from typing import Dict, List, Optional, Tuple
+from uuid import uuid4
+from sqlalchemy.orm import Session
+from . import invalidation, models, schemas
+
+TEMPLATES_KEY = "subject_templates"
+
+
+def bump_version(db: Session, name: str = TEMPLATES_KEY):
+    """Replace the version stamp so every process reloads on its next read. Caller commits."""
+    row = db.get(models.CacheVersion, name)
+    if row is None:
+        db.add(models.CacheVersion(name=name, stamp=uuid4().hex))
+    else:
+        row.stamp = uuid4().hex
+    template_cache.invalidate()
+
+
+class TemplateCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stamp: Optional[str] = None
+        self._loaded = False
+        self._all: List[schemas.SubjectTemplateResponse] = []
+        self._by_level: Dict[models.EducationLevel, List[schemas.SubjectTemplateResponse]] = {}
+        self._by_level_grade: Dict[Tuple[models.EducationLevel, Optional[int]], List[schemas.SubjectTemplateResponse]] = {}
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+
+    def get(self, db: Session, level: Optional[models.EducationLevel] = None, grade: Optional[int] = None) -> List[schemas.SubjectTemplateResponse]:
+        self._ensure_fresh(db)
+        if level is not None and grade is not None:
+            return list(self._by_level_grade.get((level, grade), []))
+        if level is not None:
+            return list(self._by_level.get(level, []))
+        if grade is not None:
+            return [t for t in self._all if t.grade == grade]
+        return list(self._all)
+
+    def _ensure_fresh(self, db: Session):
+        # Single primary-key lookup instead of a full table read
+        stamp = db.query(models.CacheVersion.stamp).filter(models.CacheVersion.name == TEMPLATES_KEY).scalar()
+        if self._loaded and stamp == self._stamp:
+            return
+        with self._lock:
+            if self._loaded and stamp == self._stamp:
+                return
+            rows = db.query(models.SubjectTemplate).all()
+            templates = [schemas.SubjectTemplateResponse.model_validate(r) for r in rows]
+            by_level: Dict = {}
+            by_level_grade: Dict = {}
+            for t in templates:
+                by_level.setdefault(t.education_level, []).append(t)
+                by_level_grade.setdefault((t.education_level, t.grade), []).append(t)
+            self._all = templates
+            self._by_level = by_level
+            self._by_level_grade = by_level_grade
+            self._stamp = stamp
+            self._loaded = True
+
+
+template_cache = TemplateCache()
+
+
+def _on_invalidation(tags):
+    if tags & {TEMPLATES_KEY, models.CacheVersion.__tablename__, invalidation.ALL}:
+        template_cache.invalidate()
+
+
+invalidation.subscribe(_on_invalidation)
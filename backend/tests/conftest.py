@@ -0,0 +1,61 @@
+"""
+API tests against a copy of the demo database (school_app.db).
+
+The engines are created when backend.database is imported, so DATABASE_URL
+points at a scratch file before anything from the app is imported. Each test
+gets that file reset to the demo data.
+"""
+import os
+import sqlite3
+import tempfile
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEMO_DB = os.path.join(REPO_ROOT, "school_app.db")
+TEST_DB = os.path.join(tempfile.mkdtemp(prefix="school_tests_"), "school_app.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from backend import invalidation  # noqa: E402
+from backend.async_database import async_engine  # noqa: E402
+from backend.database import engine  # noqa: E402
+from backend.main import app  # noqa: E402
+from backend.response_cache import response_cache  # noqa: E402
+
+PRINCIPAL = "director@googleschool.demo"
+PASSWORD = "password"
+
+
+def _reset_database():
+    engine.dispose()
+    # The backup API rewrites the file page by page, safe with the app's connections
+    source, target = sqlite3.connect(DEMO_DB), sqlite3.connect(TEST_DB)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+    response_cache.clear()
+
+
+@pytest.fixture
+def client():
+    _reset_database()
+    with TestClient(app) as test_client:
+        yield test_client
+    invalidation.stop_polling()
+
+
+@pytest.fixture
+def db():
+    """Plain sqlite3 connection to the test database, for arranging and checking rows."""
+    conn = sqlite3.connect(TEST_DB)
+    yield conn
+    conn.close()
+
+
+def login(client, email: str = PRINCIPAL) -> dict:
+    response = client.post("/token", data={"username": email, "password": PASSWORD})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
@@ -0,0 +1,54 @@
+from backend import auth_utils, events, gradebook, models, schemas
+from backend.database import SessionLocal
+from backend.routers import events as events_router
+from .conftest import login
+
+
+async def _read_backlog(email, last_event_id):
+    # TestClient waits for a response to finish and a stream never does: read the body iterator directly
+    ticket = auth_utils.create_access_token({"sub": email, "scope": events_router.TICKET_SCOPE})
+    response = await events_router.stream_events(ticket=ticket, last_event_id=last_event_id,
+                                                 authorization=None, last_event_id_header=None)
+    received = []
+    try:
+        async for chunk in response.body_iterator:
+            if chunk.startswith(": keep-alive"):
+                break
+            received.extend(line[len("event: "):] for line in chunk.splitlines() if line.startswith("event: "))
+    finally:
+        await response.body_iterator.aclose()
+    return received
+
+
+def _replayed(client, email, last_event_id):
+    """Event types replayed to `email` after last_event_id (?last_event_id=), up to the first heartbeat."""
+    return client.portal.call(_read_backlog, email, last_event_id)
+
+
+def test_invoice_events_reach_parent_not_teachers(client, db, monkeypatch):
+    monkeypatch.setattr(events, "HEARTBEAT", 0.2)
+    login(client)
+    last_event_id = db.execute("SELECT coalesce(max(id), 0) FROM change_log").fetchone()[0]
+    invoice_id, student_id, parent_id, class_id = db.execute(
+        "SELECT i.id, i.student_id, i.parent_id, u.class_id FROM invoices i JOIN users u ON u.id = i.student_id "
+        "WHERE u.class_id IS NOT NULL LIMIT 1"
+    ).fetchone()
+    tutor_email, parent_email = db.execute(
+        "SELECT (SELECT t.email FROM class_groups c JOIN users t ON t.id = c.teacher_id WHERE c.id = ?), "
+        "(SELECT email FROM users WHERE id = ?)", (class_id, parent_id)
+    ).fetchone()
+
+    session = SessionLocal()
+    try:
+        invoice = session.get(models.Invoice, invoice_id)
+        invoice.status = models.InvoiceStatus.PAID if invoice.status != models.InvoiceStatus.PAID else models.InvoiceStatus.PENDING
+        session.commit()
+        gradebook.upsert_grades(session, [schemas.GradeCell(student_id=student_id, subject="Lengua", score=7, date="2031-02-01")])
+        session.commit()
+    finally:
+        session.close()
+
+    teacher_events = _replayed(client, tutor_email, last_event_id)
+    assert "grade" in teacher_events
+    assert "invoice" not in teacher_events
+    assert "invoice" in _replayed(client, parent_email, last_event_id)
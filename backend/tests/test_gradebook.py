@@ -0,0 +1,64 @@
+import threading
+import time
+
+from sqlalchemy import event
+
+from backend import gradebook, schemas
+from backend.database import SessionLocal, engine
+from .conftest import login
+
+
+def _slow_grade_writes(conn, cursor, statement, parameters, context, executemany):
+    # Widens the window between reading the old grades and writing the new ones
+    if statement.startswith(("INSERT INTO grades", "UPDATE grades")):
+        time.sleep(0.2)
+
+
+def _run_batch(cells, errors):
+    db = SessionLocal()
+    try:
+        gradebook.upsert_grades(db, cells)
+        db.commit()
+    except Exception as e:
+        errors.append(e)
+    finally:
+        db.close()
+
+
+def test_overlapping_batches(client, db):
+    # Starts the app: schema and aggregates up to date
+    login(client)
+    student_id, class_id, subject, day = db.execute(
+        "SELECT g.student_id, u.class_id, g.subject, g.date FROM grades g JOIN users u ON u.id = g.student_id "
+        "WHERE u.class_id IS NOT NULL LIMIT 1"
+    ).fetchone()
+    batches = [
+        [schemas.GradeCell(student_id=student_id, subject=subject, date=day, score=score),
+         schemas.GradeCell(student_id=student_id, subject=subject, date="2031-01-01", score=score)]
+        for score in (2.0, 9.0)
+    ]
+    errors = []
+    event.listen(engine, "before_cursor_execute", _slow_grade_writes)
+    try:
+        threads = [threading.Thread(target=_run_batch, args=(cells, errors)) for cells in batches]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        event.remove(engine, "before_cursor_execute", _slow_grade_writes)
+    assert errors == []
+
+    cells = db.execute(
+        "SELECT count(*) FROM grades WHERE student_id = ? AND subject = ? AND date = '2031-01-01'", (student_id, subject)
+    ).fetchone()[0]
+    assert cells == 1
+    stored = db.execute(
+        "SELECT count, total, total_sq FROM grade_aggregates WHERE class_id = ? AND subject = ?", (class_id, subject)
+    ).fetchone()
+    actual = db.execute(
+        "SELECT count(g.score), sum(g.score), sum(g.score * g.score) FROM grades g JOIN users u ON u.id = g.student_id "
+        "WHERE u.class_id = ? AND g.subject = ?", (class_id, subject)
+    ).fetchone()
+    assert stored[0] == actual[0]
+    assert abs(stored[1] - actual[1]) < 1e-9 and abs(stored[2] - actual[2]) < 1e-9
@@ -0,0 +1,39 @@
+from .conftest import login
+
+
+def test_classes_list_after_promotion(client, db):
+    headers = login(client)
+    response = client.post("/classes/promote", headers=headers)
+    assert response.status_code == 200, response.text
+
+    response = client.get("/classes/", headers=headers)
+    assert response.status_code == 200, response.text
+    for class_group in response.json():
+        for subject in class_group.get("subjects", []):
+            assert isinstance(subject["hours_weekly"], int)
+    fractional = db.execute("SELECT count(*) FROM class_subjects WHERE hours_weekly != CAST(hours_weekly AS INTEGER)")
+    assert fractional.fetchone()[0] == 0
+
+
+def test_promotion_keeps_curriculum_without_templates(client, db):
+    headers = login(client)
+    before = dict(db.execute("SELECT class_id, count(*) FROM class_subjects GROUP BY class_id"))
+    dry = client.post("/classes/promote", params={"dry_run": True}, headers=headers).json()
+    result = client.post("/classes/promote", headers=headers).json()
+    assert result["kept_curriculum"] == dry["kept_curriculum"]
+    assert result["subjects_created"] == dry["subjects_created"]
+
+    after = dict(db.execute("SELECT class_id, count(*) FROM class_subjects GROUP BY class_id"))
+    for class_id in result["kept_curriculum"]:
+        assert after.get(class_id) == before.get(class_id)
+    replaced = [p["class_id"] for p in result["promoted"] if p["class_id"] not in result["kept_curriculum"]]
+    assert sum(after.get(class_id, 0) for class_id in replaced) == result["subjects_created"]
+
+
+def test_promoted_class_schedule_generation(client):
+    headers = login(client)
+    client.post("/classes/promote", headers=headers)
+    classes = client.get("/classes/", headers=headers).json()
+    class_id = next(c["id"] for c in classes if c.get("subjects"))
+    response = client.post(f"/schedule/generate/{class_id}", headers=headers)
+    assert response.status_code != 500, response.text
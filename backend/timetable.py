@@ -0,0 +1,71 @@
+"""
+Timetable placement, independent of the database.
+
+`place_subjects` is the greedy algorithm behind POST /schedule/generate: each
+weekly hour of each subject is a block, blocks are shuffled, and each block
+goes into the first free (day, slot) of the week where its teacher is
+available and not already teaching another class. It works on any objects
+with `teacher_id` and `hours_weekly` attributes (ClassSubject rows in the
+API, plain tuples in timetable_benchmark.py).
+"""
+import random
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+
+DAYS = ["MON", "TUE", "WED", "THU", "FRI"]
+SLOTS = range(1, 9) # 8 slots
+
+# (day, slot)
+Cell = Tuple[str, int]
+
+
+@dataclass
+class Placement:
+    # (subject, day, slot) for every placed block
+    placed: List[Tuple[object, str, int]] = field(default_factory=list)
+    # One entry per block that found no slot
+    unplaced: List[object] = field(default_factory=list)
+
+    @property
+    def rate(self) -> float:
+        total = len(self.placed) + len(self.unplaced)
+        return len(self.placed) / total if total else 1.0
+
+
+def place_subjects(subjects, teacher_availability: Dict[Hashable, Set[Cell]],
+                   teacher_busy: Set[Tuple[Hashable, str, int]], rng: Optional[random.Random] = None) -> Placement:
+    """
+    Place one class's subjects in its empty week.
+
+    teacher_availability maps a teacher to the (day, slot) cells they work; a
+    teacher without entries (or with an empty set) is available everywhere.
+    teacher_busy holds (teacher, day, slot) already taken in other classes and
+    is updated in place, so consecutive calls for several classes never
+    double-book a shared teacher.
+    """
+    rng = rng or random
+    blocks = [sub for sub in subjects for _ in range(sub.hours_weekly)]
+    # Shuffle to vary results if multiple runs
+    rng.shuffle(blocks)
+
+    result = Placement()
+    class_grid_filled: Set[Cell] = set()
+    for block in blocks:
+        tid = block.teacher_id
+        available = teacher_availability.get(tid) if tid else None
+        for day in DAYS:
+            cell = next((
+                slot_idx for slot_idx in SLOTS
+                if (day, slot_idx) not in class_grid_filled
+                and (not tid or not available or (day, slot_idx) in available)
+                and (not tid or (tid, day, slot_idx) not in teacher_busy)
+            ), None)
+            if cell is not None:
+                class_grid_filled.add((day, cell))
+                if tid:
+                    teacher_busy.add((tid, day, cell))
+                result.placed.append((block, day, cell))
+                break
+        else:
+            result.unplaced.append(block)
+    return result
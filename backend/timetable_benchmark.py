@@ -0,0 +1,186 @@
+"""
+Scaling benchmark for the timetable generator (timetable.place_subjects).
+
+Builds synthetic school instances in memory (no database). Curricula come
+from synthetic.SUBJECTS and classes cycle through the grade sequence.
+Specialists are shared between classes, each one covering up to a number of
+weekly hours, and every teacher works a fraction of the 40 weekly slots.
+Each class is then placed in turn, as repeated POST /schedule/generate calls
+would do, so specialists fill up across classes. For every size and
+tightness profile it reports the solve time (median of --repeats), the
+placement rate and the peak memory (tracemalloc, measured in a separate run
+so it does not distort the timings). It also reports how solve time grows
+with the number of blocks (log-log slope).
+
+    python -m backend.timetable_benchmark
+    python -m backend.timetable_benchmark --classes 50,100,400 --profiles tight --output curve.csv
+"""
+import argparse
+import csv
+import json
+import math
+import random
+import statistics
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional
+from .school_structure import GRADES
+from .synthetic import SUBJECTS
+from .timetable import DAYS, SLOTS, place_subjects
+
+
+class Subject(NamedTuple):
+    id: str
+    name: str
+    teacher_id: str
+    hours_weekly: int
+
+
+class Instance(NamedTuple):
+    classes: List[List[Subject]]
+    teacher_availability: Dict[str, set]
+    teachers: int
+    blocks: int
+
+
+# name -> (share of the week each teacher works, weekly hours per specialist)
+PROFILES = {
+    "loose": (1.0, 20),
+    "normal": (0.9, 24),
+    "tight": (0.75, 30),
+}
+
+
+def build_instance(n_classes: int, availability: float, specialist_hours: int, seed: int) -> Instance:
+    rng = random.Random(seed)
+    plan = [GRADES[c % len(GRADES)][1] for c in range(n_classes)]
+
+    load = defaultdict(int)
+    for level in plan:
+        for _, hours, spec in SUBJECTS[level]:
+            if spec:
+                load[spec] += hours
+    specialists = {
+        spec: [f"spec_{spec.lower()}_{i}" for i in range(math.ceil(hours / specialist_hours))]
+        for spec, hours in sorted(load.items())
+    }
+
+    classes = []
+    next_specialist = defaultdict(int)
+    for c, level in enumerate(plan):
+        subjects = []
+        for i, (name, hours, spec) in enumerate(SUBJECTS[level]):
+            if spec:
+                # Round-robin over the specialists of that subject
+                pool = specialists[spec]
+                teacher_id = pool[next_specialist[spec] % len(pool)]
+                next_specialist[spec] += 1
+            else:
+                teacher_id = f"tutor_{c}"
+            subjects.append(Subject(f"c{c}_s{i}", name, teacher_id, hours))
+        classes.append(subjects)
+
+    teachers = sorted({s.teacher_id for subjects in classes for s in subjects})
+    cells = [(day, slot) for day in DAYS for slot in SLOTS]
+    teacher_availability = {tid: {cell for cell in cells if rng.random() < availability} for tid in teachers}
+    blocks = sum(s.hours_weekly for subjects in classes for s in subjects)
+    return Instance(classes, teacher_availability, len(teachers), blocks)
+
+
+def solve(instance: Instance, seed: int) -> float:
+    """Place every class in turn. Returns the placement rate."""
+    rng = random.Random(seed)
+    teacher_busy = set()
+    placed = total = 0
+    for subjects in instance.classes:
+        result = place_subjects(subjects, instance.teacher_availability, teacher_busy, rng)
+        placed += len(result.placed)
+        total += len(result.placed) + len(result.unplaced)
+    return placed / total if total else 1.0
+
+
+def measure(n_classes: int, profile: str, repeats: int, seed: int) -> Dict:
+    availability, specialist_hours = PROFILES[profile]
+    instance = build_instance(n_classes, availability, specialist_hours, seed)
+
+    timings = []
+    for r in range(repeats):
+        start = time.perf_counter()
+        rate = solve(instance, seed + r)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    solve(instance, seed)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "classes": n_classes,
+        "profile": profile,
+        "teachers": instance.teachers,
+        "blocks": instance.blocks,
+        "solve_ms": round(statistics.median(timings) * 1000, 3),
+        "us_per_block": round(statistics.median(timings) / instance.blocks * 1e6, 2),
+        "placement_rate": round(rate, 4),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def scaling_exponent(rows: List[Dict]) -> Optional[float]:
+    """Least-squares slope of log(solve time) over log(blocks): ~1 is linear."""
+    points = [(math.log(r["blocks"]), math.log(r["solve_ms"])) for r in rows if r["solve_ms"] > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    var = sum((x - mean_x) ** 2 for x, _ in points)
+    if not var:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var
+
+
+def print_table(rows: List[Dict]):
+    print(f"{'classes':>8}{'profile':>9}{'teachers':>10}{'blocks':>8}{'solve ms':>11}{'us/block':>10}"
+          f"{'placed':>9}{'peak KiB':>10}")
+    for r in rows:
+        print(f"{r['classes']:>8}{r['profile']:>9}{r['teachers']:>10}{r['blocks']:>8}{r['solve_ms']:>11}"
+              f"{r['us_per_block']:>10}{r['placement_rate']:>9.1%}{r['peak_kib']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scaling benchmark for the timetable generator")
+    parser.add_argument("--classes", default="10,25,50,100,200,400", help="comma separated class counts")
+    parser.add_argument("--profiles", default=",".join(PROFILES), help=f"tightness profiles: {', '.join(PROFILES)}")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the rows as .json or .csv (e.g. for plotting)")
+    args = parser.parse_args()
+
+    profiles = [p.strip() for p in args.profiles.split(",") if p.strip()]
+    unknown = [p for p in profiles if p not in PROFILES]
+    if unknown:
+        parser.error(f"unknown profiles: {', '.join(unknown)}")
+
+    rows = [measure(int(n), profile, args.repeats, args.seed)
+            for profile in profiles for n in args.classes.split(",")]
+    print_table(rows)
+    print()
+    for profile in profiles:
+        slope = scaling_exponent([r for r in rows if r["profile"] == profile])
+        if slope is not None:
+            print(f"{profile}: solve time ~ blocks^{slope:.2f}")
+
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            if args.output.endswith(".csv"):
+                writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+            else:
+                json.dump(rows, f, indent=2)
+        print(f"Saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 from sqlalchemy.orm import Session
 from backend.database import SessionLocal, engine
-from backend.models import SubjectTemplate, EducationLevel
+from backend.models import SubjectTemplate
+from backend.curriculum_loader import load_curriculum
+from backend.schemas import OfficialCurriculum
 
 # Full JSON provided by user
 CURRICULUM_DATA = {
@@ -99,28 +101,10 @@ def seed_curriculum():
         SubjectTemplate.__table__.create(engine)
 
         print("Seeding Detailed Madrid Curriculum...")
-        
-        for level_key, subjects in CURRICULUM_DATA["asignaturas_y_horas"].items():
-            # level_key format: "1_Primaria"
-            grade = int(level_key.split('_')[0])
-            
-            for subj in subjects:
-                # Filter out "Recreo" if desired, or keep it. User included it.
-                # Usually Recess is not a 'subject' with a teacher. 
-                # I'll exclude Recreo for Class Assignments purposes as it usually creates noise.
-                if subj["nombre"] == "Recreo":
-                    continue
-
-                template = SubjectTemplate(
-                    id=f"tmpl_{level_key}_{subj['nombre'].replace(' ', '').lower()[:6]}",
-                    name=subj["nombre"],
-                    default_hours=float(subj["horas"]),
-                    education_level=EducationLevel.PRIMARIA,
-                    grade=grade
-                )
-                db.add(template)
-        
+        # "Recreo" is skipped by the loader: it is not a subject with a teacher.
+        created, updated, _ = load_curriculum(db, OfficialCurriculum(**CURRICULUM_DATA))
         db.commit()
+        print(f"Created {created} templates, updated {updated}.")
         print("Successfully seeded detailed official curriculum.")
         
     except Exception as e:
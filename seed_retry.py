@@ -1,5 +1,6 @@
 from backend.database import SessionLocal
-from backend.models import SubjectTemplate, EducationLevel
+from backend.curriculum_loader import load_curriculum
+from backend.schemas import OfficialCurriculum
 
 # Full JSON provided by user
 CURRICULUM_DATA = {
@@ -85,20 +86,9 @@ def seed():
     db = SessionLocal()
     try:
         print("Seeding...")
-        for level_key, subjects in CURRICULUM_DATA["asignaturas_y_horas"].items():
-            grade = int(level_key.split('_')[0])
-            for subj in subjects:
-                if subj["nombre"] == "Recreo": continue
-                
-                t = SubjectTemplate(
-                    id=f"tmpl_{level_key}_{subj['nombre'].replace(' ', '').lower()[:15]}", # Increased length to avoid collision
-                    name=subj["nombre"],
-                    default_hours=float(subj["horas"]),
-                    education_level=EducationLevel.PRIMARIA,
-                    grade=grade
-                )
-                db.add(t)
+        created, updated, _ = load_curriculum(db, OfficialCurriculum(**CURRICULUM_DATA))
         db.commit()
+        print(f"Created {created} templates, updated {updated}.")
         print("Done.")
     except Exception as e:
         print(f"Error: {e}")
@@ -44,25 +44,13 @@ def make_request(method, endpoint, data=None):
 def seed_templates():
     print("Seeding Subject Templates via urllib...")
     
-    existing = make_request('GET', '/curriculum/templates')
-    existing_names = set()
-    if existing:
-        existing_names = {(t['name'], t['education_level']) for t in existing}
+    # One round trip: the server upserts on (name, level, grade), so re-running is safe
+    res = make_request('POST', '/curriculum/templates/bulk', templates)
+    if not res:
+        print("Failed to seed templates")
+        return
 
-    count = 0
-    for t in templates:
-        if (t['name'], t['education_level']) in existing_names:
-            print(f"Skipping {t['name']} ({t['education_level']}) - Already exists")
-            continue
-            
-        res = make_request('POST', '/curriculum/templates', t)
-        if res:
-            print(f"Created: {t['name']} ({t['education_level']})")
-            count += 1
-        else:
-            print(f"Failed to create {t['name']}")
-
-    print(f"\nSeeding complete. Added {count} new templates.")
+    print(f"\nSeeding complete. Added {res['created']} new templates, updated {res['updated']}.")
 
 if __name__ == "__main__":
     seed_templates()